@@ -452,19 +452,24 @@ class storedeff(object):
          * getmctruthinfo
          * setuptree
         """
-        import ROOT
-        import os
+        from PyAnUtils.chainindex import chainindex
+        from PyAnUtils import execution
+
+        # implicit multi-threading, see PyAnUtils.execution
+        execution.apply()
         
         self.rootfiles = rootfiles
         
-        self.tree = ROOT.TChain(chainname)
+        self._chainindex = chainindex(chainname,self.rootfiles)
+        self.tree = self._chainindex.buildchain()
         print "TChain '%s' created" % chainname
         print "Adding %i root files to the tree" % len(self.rootfiles)
-        for i in sorted(self.rootfiles):
-            self.tree.AddFile(i)
         
         self.plotsactivated = False
-        self.nentries   = self.tree.GetEntries()
+        # lazy evaluated, see getentries
+        self._nentries  = None
+        # lazy evaluated, see getschema
+        self._schema    = None
         # Setting up how-many DV are:
         self.tree.GetEntry(0)
         self.llpindices = xrange(len(self.tree.dv_X))
@@ -593,11 +598,31 @@ class storedeff(object):
                     thf2.Fill(getattr(self.tree,var1)[k],getattr(self.tree,var2)[k])
 
 
+    @property
+    def nentries(self):
+        """The number of entries of the chain, evaluated the first time
+        is used (see `PyAnUtils.chainindex`)
+        """
+        if self._nentries is None:
+            self._nentries = self._chainindex.getentries(self.tree)
+        return self._nentries
+
     def getentries(self):
         """
         """
         return self.nentries
 
+    def getschema(self):
+        """The schema of the tree (branch names, types, ...), obtained
+        without opening the files if it is already in the cache (see
+        `PyAnUtils.treeschema`)
+        """
+        from PyAnUtils.treeschema import getschema
+
+        if self._schema is None:
+            self._schema = getschema(self._chainindex._treename,self.rootfiles)
+        return self._schema
+
     def filleff(self,trgdecdict,effsvinst,ignorematching=False,**kw):
         """..function:: filleff(trgdecdic,effsvinst[,ignoremathcing=True]) 
 
@@ -760,8 +785,8 @@ class storedeff(object):
                 _bname = bname
                 if bname in dvbranches:
                     _bname = bname.split('_')[0]
-                vtype = self.tree.GetBranch(_bname).GetClassName()
-            except ReferenceError:
+                vtype = self.getschema().getclassname(_bname)
+            except AttributeError:
                 raise ReferenceError("roofitTree: The branch '%s' doesn't"\
                         " exist in the Tree" % bname)
             # Obtain the equivalent non-vector
@@ -883,19 +908,17 @@ class rpvmcinfo(storedeff):
         """
         super(rpvmcinfo,self).__init__(rootfiles,'RPVMCInfoTree')
 
-        self.__vars__ = []
-        for i in filter(lambda x: x.GetName().find('HLT_') == -1, 
-                self.tree.GetListOfBranches()):
-            self.__vars__.append(i.GetName())
+        self.__vars__ = filter(lambda x: x.find('HLT_') == -1,
+                self.getschema().branchnames())
 
     def gettriggersnames(self):
         """.. method::
+        the names of the trigger branches, obtained from the schema of the
+        tree (see PyAnUtils.treeschema), i.e. without opening the file if
+        the schema is already in the cache
         """
-        triggersinntuple = []
-        for tbranch in filter(lambda x: x.GetName().find('HLT')==0 and \
-                x.GetName().lower().find('jetroi') == -1,self.tree.GetListOfBranches()):
-            triggersinntuple.append( tbranch.GetName() )
-        return triggersinntuple
+        return filter(lambda x: x.find('HLT')==0 and x.lower().find('jetroi') == -1,
+                self.getschema().branchnames())
     
     def setuptree(self,triggerbr):
         """
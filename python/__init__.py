@@ -9,9 +9,10 @@
 	  .. packageauthor:: Jordi Duarte-Campderros <jorge.duarte.campderros@cern.ch>
 """
 # Used when 'from PyAnUtils import *'
-__all__ = [ 'plotsytles', 'pyanfunctions' ,'histocontainer','unit', 'getavailableunits' ]
+__all__ = [ 'plotsytles', 'pyanfunctions' ,'histocontainer','execution','unit', 'getavailableunits' ]
 # Used when 'import PyAnUtils'
 import plotstyles
 import pyanfunctions
 import histocontainer
+import execution
 from systemofunits import unit,getavailableunits
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+""":module:`chainindex` -- Persistent entry index of ROOT.TChain files
+=====================================================================
+
+.. module:: chainindex
+      :platform: Unix
+      :synopsis: Keep on disk the number of entries of each file of a
+                 chain, so a ROOT.TChain can be built (and its entries
+                 mapped to the files) without opening the files.
+
+       .. scriptauthor:: Jordi Duarte-Campderros <jorge.duarte.campderros@cern.ch>
+"""
+
+class chainindex(object):
+    """Sidecar index of a chain: each file, identified by its path, size
+    and modification time (see `PyAnUtils.pyanfunctions.filesignature`),
+    is mapped to the number of entries of the tree. The index is stored in
+    the cache directory of the package (one file per tree name) and it is
+    used to build the ROOT.TChain with the number of entries of every file
+    already known, therefore ROOT does not open any file until its entries
+    are actually read.
+
+    Example
+    -------
+    >>> idx = chainindex('RPVMCInfoTree',['f1.root','f2.root'])
+    >>> chain = idx.buildchain()
+    >>> nentries = idx.getentries(chain)
+    """
+    def __init__(self,treename,rootfiles):
+        """Persistent entry index of the chain `treename` built with the
+        files `rootfiles`
+
+        Parameters
+        ----------
+        treename: str
+            the name of the tree
+        rootfiles: list(str)
+            the files of the chain, they are going to be used sorted.
+            Remote files (URLs as root://...) are never indexed
+
+        Raises
+        ------
+        IOError
+            if any of the local files does not exist
+        """
+        import os
+        from PyAnUtils.pyanfunctions import getcachedir,filesignature,loadcache
+
+        self._treename  = treename
+        self._rootfiles = sorted(rootfiles)
+        self._signatures= map(lambda f: (f.find('://') == -1 and filesignature(f)) or None,\
+                self._rootfiles)
+        self._indexfile = os.path.join(getcachedir('chainindex'),treename+'.pkl')
+        # the basket clusters of each file, loaded when needed (see getclusters)
+        self._clustersfile = os.path.join(getcachedir('chainindex'),treename+'.clusters.pkl')
+        self._clusters  = None
+        self._index     = loadcache(self._indexfile,{})
+        # filename --> entries, the files not indexed (remote) are only
+        # kept in memory
+        self._entries   = {}
+        self._modified  = False
+
+    def buildchain(self):
+        """Create the ROOT.TChain, the files with a known number of entries
+        are added without being opened
+
+        Return
+        ------
+        ROOT.TChain
+        """
+        import ROOT
+
+        chain = ROOT.TChain(self._treename)
+        for fname,sig in zip(self._rootfiles,self._signatures):
+            if self._index.has_key(sig):
+                chain.AddFile(fname,self._index[sig])
+            else:
+                chain.AddFile(fname)
+        return chain
+
+    def isknown(self):
+        """Whether all the files of the chain are in the index
+        """
+        return all(map(lambda sig: sig is not None and self._index.has_key(sig),\
+                self._signatures))
+
+    def getentries(self,chain):
+        """The total number of entries of the chain. If any file is not in
+        the index, ROOT counts the entries (opening the unknown files) and
+        the index is updated and saved
+
+        Parameters
+        ----------
+        chain: ROOT.TChain
+            the chain created by `buildchain`
+
+        Return
+        ------
+        int
+        """
+        nentries = chain.GetEntries()
+        if self.isknown():
+            return nentries
+        offsets = chain.GetTreeOffset()
+        offsets.SetSize(chain.GetNtrees()+1)
+        for k,(fname,sig) in enumerate(zip(self._rootfiles,self._signatures)):
+            if sig is not None:
+                self._index[sig] = offsets[k+1]-offsets[k]
+            else:
+                self._entries[fname] = offsets[k+1]-offsets[k]
+        self._modified = True
+        self.save()
+        return nentries
+
+    def getfileentries(self):
+        """The per-file entries and offsets (first global entry) of the
+        chain, only the files already in the index (or counted by
+        `getentries`, the remote ones) are included
+
+        Return
+        ------
+        list((str,int,int)): [ (filename,offset,entries), ... ]
+        """
+        fileentries = []
+        offset = 0
+        for fname,sig in zip(self._rootfiles,self._signatures):
+            if self._index.has_key(sig):
+                nentries = self._index[sig]
+            elif self._entries.has_key(fname):
+                nentries = self._entries[fname]
+            else:
+                break
+            fileentries.append( (fname,offset,nentries) )
+            offset += nentries
+        return fileentries
+
+    def getclusters(self):
+        """The ROOT basket clusters of the files of the chain (see
+        `ROOT.TTree.GetClusterIterator`), i.e. the entry ranges which can be
+        read independently. They are stored in the cache keyed by the file
+        signature, therefore only the files not yet known are opened (the
+        remote files are kept only in memory). As `getfileentries`, only
+        the files with known entries are included
+
+        Return
+        ------
+        list((int,int)): [ (firstentry,lastentry+1), ... ] in global
+            entry numbers of the chain
+        """
+        import ROOT
+        from PyAnUtils.pyanfunctions import loadcache,storecache
+
+        if self._clusters is None:
+            self._clusters = loadcache(self._clustersfile,{})
+        modified = False
+        clusters = []
+        for (fname,offset,nentries),sig in zip(self.getfileentries(),self._signatures):
+            key = sig or fname
+            if not self._clusters.has_key(key):
+                f = ROOT.TFile.Open(fname)
+                t = f.Get(self._treename)
+                it = t.GetClusterIterator(0)
+                bounds = []
+                first = it()
+                while first < nentries:
+                    last = it.GetNextEntry()
+                    bounds.append( (first,min(last,nentries)) )
+                    first = it()
+                f.Close()
+                self._clusters[key] = bounds
+                modified = modified or sig is not None
+            clusters += map(lambda (first,last): (offset+first,offset+last),self._clusters[key])
+        if modified:
+            stored = loadcache(self._clustersfile,{})
+            stored.update(filter(lambda (key,bounds): type(key) is tuple,\
+                    self._clusters.iteritems()))
+            storecache(self._clustersfile,stored)
+        return clusters
+
+    def save(self):
+        """Store the index on disk, merging it with the content written
+        meanwhile by other processes
+        """
+        from PyAnUtils.pyanfunctions import loadcache,storecache
+
+        if not self._modified:
+            return
+        index = loadcache(self._indexfile,{})
+        index.update(self._index)
+        storecache(self._indexfile,index)
+        self._index = index
+        self._modified = False
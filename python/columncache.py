@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+""":module:`columncache` -- Memory-mappable columnar copies of trees
+====================================================================
+
+.. module:: columncache
+      :platform: Unix
+      :synopsis: Write selected columns of a tree as contiguous binary files
+                 (plus a JSON manifest) and read them back with numpy.memmap,
+                 without ROOT and without decompression.
+
+       .. scriptauthor:: Jordi Duarte-Campderros <jorge.duarte.campderros@cern.ch>
+"""
+
+MANIFEST = 'manifest.json'
+
+class columncachewriter(object):
+    """Write chunks of columns (dict of numpy.ndarray or jaggedarray, see
+    `PyAnUtils.retrievetrees.storedtree.iterate`) to a column cache
+    directory. Each column is stored in a contiguous binary file (and an
+    extra offsets file for the jagged columns) which is appended chunk by
+    chunk; the manifest is written at `close`
+
+    Example
+    -------
+    >>> w = columncachewriter('/scratch/kshorts_cache')
+    >>> for chunk in t.iterate(100000,['mass','trk_eta']):
+    ...     w.append(chunk)
+    >>> w.close()
+    """
+    def __init__(self,path,metadata=None):
+        """Create the cache directory
+
+        Parameters
+        ----------
+        path: str
+            the directory of the cache (created if needed)
+        metadata: dict, optional
+            extra information to keep in the manifest
+        """
+        import os
+
+        self._path = path
+        try:
+            os.makedirs(path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise IOError("Not possible to create the directory '{0}'".format(path))
+        self._metadata = metadata or {}
+        self._columns = {}
+        self._files = {}
+        self._nentries = 0
+
+    def append(self,chunk):
+        """Append a chunk of entries, all the chunks must have the same
+        columns
+
+        Parameters
+        ----------
+        chunk: dict(str,numpy.ndarray|jaggedarray)
+        """
+        import os
+        import numpy as np
+        from PyAnUtils.jaggedarray import jaggedarray
+
+        if len(self._columns) == 0:
+            for k,(name,col) in enumerate(sorted(chunk.iteritems())):
+                desc = { 'file': 'col{0}.bin'.format(k) }
+                if isinstance(col,jaggedarray):
+                    desc['kind'] = 'jagged'
+                    desc['dtype'] = col.content.dtype.str
+                    desc['offsets'] = 'col{0}.offsets.bin'.format(k)
+                    desc['ncontent'] = 0
+                    self._files[desc['offsets']] = open(os.path.join(self._path,desc['offsets']),'wb')
+                    np.zeros(1,dtype=np.int64).tofile(self._files[desc['offsets']])
+                else:
+                    desc['kind'] = 'scalar'
+                    desc['dtype'] = np.asarray(col).dtype.str
+                self._files[desc['file']] = open(os.path.join(self._path,desc['file']),'wb')
+                self._columns[name] = desc
+        elif set(chunk.keys()) != set(self._columns.keys()):
+            raise KeyError("The chunk columns do not match the cache columns")
+
+        nentries = None
+        for name,col in chunk.iteritems():
+            desc = self._columns[name]
+            if desc['kind'] == 'jagged':
+                col.content.astype(desc['dtype']).tofile(self._files[desc['file']])
+                (col.offsets[1:]+desc['ncontent']).tofile(self._files[desc['offsets']])
+                desc['ncontent'] += len(col.content)
+            else:
+                np.asarray(col).astype(desc['dtype']).tofile(self._files[desc['file']])
+            nentries = len(col)
+        self._nentries += nentries or 0
+
+    def close(self):
+        """Close the column files and write the manifest
+        """
+        import os
+        import json
+
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        manifest = { 'nentries': self._nentries, 'columns': self._columns,
+                'metadata': self._metadata }
+        tmpname = os.path.join(self._path,MANIFEST+'.tmp')
+        with open(tmpname,'w') as f:
+            json.dump(manifest,f,indent=1)
+        os.rename(tmpname,os.path.join(self._path,MANIFEST))
+
+class columncache(object):
+    """Read-only access to a column cache written by `columncachewriter`
+    (or `PyAnUtils.retrievetrees.storedtree.to_column_cache`). The columns
+    are numpy.memmap arrays, therefore opening the cache is instantaneous,
+    only the pages actually used are read, and they are shared between the
+    processes of the same node
+
+    Example
+    -------
+    >>> c = columncache('/scratch/kshorts_cache')
+    >>> mass = c['mass']
+    >>> eta  = c['trk_eta']   # jaggedarray
+    """
+    def __init__(self,path):
+        """Open the cache
+
+        Parameters
+        ----------
+        path: str
+            the directory of the cache
+
+        Raises
+        ------
+        IOError
+            if the directory does not contain a valid manifest
+        """
+        import os
+        import json
+
+        self._path = path
+        try:
+            with open(os.path.join(path,MANIFEST)) as f:
+                manifest = json.load(f)
+        except (IOError,ValueError):
+            raise IOError("'{0}' is not a valid column cache".format(path))
+        self._nentries = manifest['nentries']
+        self._columns  = manifest['columns']
+        self.metadata  = manifest['metadata']
+        self._opened = {}
+
+    def keys(self):
+        """The names of the columns
+        """
+        return self._columns.keys()
+
+    def getentries(self):
+        """Number of entries
+        """
+        return self._nentries
+
+    def _memmap(self,filename,dtype,length):
+        import os
+        import numpy as np
+
+        if length == 0:
+            return np.zeros(0,dtype=dtype)
+        return np.memmap(os.path.join(self._path,filename),dtype=dtype,mode='r',shape=(length,))
+
+    def __getitem__(self,name):
+        """The column `name`, numpy.memmap for the scalar columns and a
+        jaggedarray (with memmap buffers) for the jagged ones
+
+        Raises
+        ------
+        KeyError
+            if the column is not in the cache
+        """
+        from PyAnUtils.jaggedarray import jaggedarray
+
+        if self._opened.has_key(name):
+            return self._opened[name]
+        desc = self._columns[name]
+        if desc['kind'] == 'jagged':
+            col = jaggedarray(self._memmap(desc['file'],desc['dtype'],desc['ncontent']),
+                    self._memmap(desc['offsets'],'<i8',self._nentries+1))
+        else:
+            col = self._memmap(desc['file'],desc['dtype'],self._nentries)
+        self._opened[name] = col
+        return col
+
+    def read_columns(self,branches=None,start=0,stop=None):
+        """Same interface than `PyAnUtils.retrievetrees.storedtree.read_columns`
+
+        Return
+        ------
+        dict(str,numpy.ndarray|jaggedarray)
+        """
+        if branches is None:
+            branches = self.keys()
+        elif type(branches) is str:
+            branches = [branches]
+        if stop is None or stop > self._nentries:
+            stop = self._nentries
+        return dict(map(lambda name: (name,self[name][start:stop]),branches))
+
+    def iterate(self,chunk_size=100000,branches=None):
+        """Same interface than `PyAnUtils.retrievetrees.storedtree.iterate`
+        """
+        for first in xrange(0,self._nentries,chunk_size):
+            yield self.read_columns(branches,first,first+chunk_size)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+""":module:`execution` -- Package-level execution context
+=========================================================
+
+.. module:: execution
+      :platform: Unix
+      :synopsis: Control how ROOT uses the cores of the node, e.g. the
+                 implicit multi-threading (parallel decompression of the
+                 baskets) used by the TChain reads of the package classes.
+
+       .. scriptauthor:: Jordi Duarte-Campderros <jorge.duarte.campderros@cern.ch>
+"""
+
+# The default number of threads is given by the environment variable
+# PYANUTILS_THREADS (0: implicit multi-threading disabled), if not defined
+# the implicit multi-threading of ROOT is not modified
+_CONTEXT = { 'threads': None, 'applied': None }
+
+def configure(threads=None):
+    """Configure the execution context of the package. The configuration
+    is applied to ROOT now if it is already loaded, otherwise when the
+    first tree of the package is created (see `apply`)
+
+    Parameters
+    ----------
+    threads: int|None [Default: None]
+        size of the ROOT implicit multi-threading pool: 0 disables it, a
+        negative value uses all the cores of the node. If None, the value
+        of the environment variable PYANUTILS_THREADS is used (if not
+        defined, the ROOT implicit multi-threading is not modified)
+
+    Example
+    -------
+    >>> from PyAnUtils import execution
+    >>> execution.configure(threads=8)
+    >>> t = plaintree(files,'KsTree_KsSampleCreator')
+    >>> execution.getthreads()
+    8
+    """
+    import sys
+
+    _CONTEXT['threads'] = threads
+    _CONTEXT['applied'] = None
+    if sys.modules.has_key('ROOT'):
+        apply()
+
+def getconfigured():
+    """The number of threads requested (see `configure`), None if nothing
+    was requested
+    """
+    import os
+
+    if _CONTEXT['threads'] is not None:
+        return _CONTEXT['threads']
+    if os.getenv('PYANUTILS_THREADS') is None:
+        return None
+    try:
+        return int(os.getenv('PYANUTILS_THREADS'))
+    except ValueError:
+        raise RuntimeError("Invalid PYANUTILS_THREADS value '{0}'".format(\
+                os.getenv('PYANUTILS_THREADS')))
+
+def apply():
+    """Apply the configuration to ROOT (if not done yet). It is called by
+    the constructors of the trees of the package (`retrievetrees.storedtree`,
+    `dvAnUtils.trigeffclass.storedeff`), scripts reading ROOT files directly
+    should call it before the loop
+    """
+    import os
+    import ROOT
+
+    threads = getconfigured()
+    # nothing requested: the implicit multi-threading is left as it is
+    if threads is None:
+        return
+    # Only once per process (the forked workers apply their own)
+    if _CONTEXT['applied'] == (os.getpid(),threads):
+        return
+    _CONTEXT['applied'] = (os.getpid(),threads)
+    if threads == 0:
+        if ROOT.ROOT.IsImplicitMTEnabled():
+            ROOT.ROOT.DisableImplicitMT()
+        return
+    if ROOT.ROOT.IsImplicitMTEnabled():
+        ROOT.ROOT.DisableImplicitMT()
+    if threads < 0:
+        ROOT.ROOT.EnableImplicitMT()
+    else:
+        ROOT.ROOT.EnableImplicitMT(threads)
+
+def getthreads():
+    """The number of threads actually used by ROOT (0 if the implicit
+    multi-threading is disabled)
+
+    Return
+    ------
+    int
+    """
+    import ROOT
+
+    if not ROOT.ROOT.IsImplicitMTEnabled():
+        return 0
+    try:
+        return ROOT.ROOT.GetImplicitMTPoolSize()
+    except AttributeError:
+        # older ROOT versions
+        return ROOT.ROOT.GetThreadPoolSize()
@@ -20,25 +20,50 @@ class HistoContainer():
         * bookhisto: to book histograms already present
         * create_and_book_histo: to book histograms which should be
             created by the class
+    With the 'numpy' backend, the histograms created by the class are
+    `PyAnUtils.numpyhisto.numpyhisto` objects (same booking and filling
+    API), and ROOT is only needed to plot them or to write them 
     """
-    def __init__(self):
+    def __init__(self,backend='root'):
         """The instantiation of this class defines and populates a bunch 
         of useful data-members, the main initializator methods are:
             * bookhisto: to book histograms already present
             * create_and_book_histo: to book histograms which should be
                     created by the class
+
+        Parameters
+        ----------
+        backend: str, optional
+            the storage of the histograms created by the class: 'root'
+            (ROOT.THX, default) or 'numpy' (numpyhisto, converted to
+            ROOT.THX only in `plot` and `write_to`)
+
+        Raises
+        ------
+        RuntimeError
+            if the backend is not valid
         """
         from PyAnUtils.pyanfunctions import ExtraOpt
-        
+
+        if backend not in ['root','numpy']:
+            raise RuntimeError("Not valid backend '{0}', use 'root' or 'numpy'".format(backend))
+        self._backend = backend
         self._histos = {}
         self._usercreated = {}
         self._class  = {}
         self._associated = {}
         self._description= {}
+        # name --> (entries,integral), invalidated with the fills
+        self._integrals = {}
+        # view key --> ROOT.THX re-used to draw the views (see normalized)
+        self._scratch = {}
+        # name --> { shard key: numpyhisto } (None: sharded fill disabled)
+        self._shards = None
         self._opts   = { 'create_and_book_histo': ExtraOpt( [('npoints_y',None),('ylow',None), ('yhigh',None),
                                     ('npoints_z',None), ('zlow',None), ('zhigh',None),
                                     ('description',''), ('color',None), ('title',''),
-                                    ('xtitle',None),('ytitle',None),('ztitle',None)] ),
+                                    ('xtitle',None),('ytitle',None),('ztitle',None),
+                                    ('sparse',False)] ),
 
                           'book_histo': ExtraOpt( [('description',''), ('title',''),
                                     ('color',None),
@@ -78,17 +103,22 @@ class HistoContainer():
             if an histogram with the same name already was booked
             
         """
-        import ROOT
         from PyAnUtils.pyanfunctions import set_attr_plotobject
+        from PyAnUtils.numpyhisto import numpyhisto
 
         opt = self._opts['book_histo']
         opt.reset()
         opt.setkwd(kwd)
         
         name = h.GetName()
-        set_attr_plotobject(h,xtitle=opt.xtitle,ytitle=opt.ytitle,
-                ztitle=opt.ztitle,title=opt.title,
-                color=opt.color)
+        if isinstance(h,numpyhisto):
+            h.setattributes(xtitle=opt.xtitle,ytitle=opt.ytitle,
+                    ztitle=opt.ztitle,title=opt.title,
+                    color=opt.color)
+        else:
+            set_attr_plotobject(h,xtitle=opt.xtitle,ytitle=opt.ytitle,
+                    ztitle=opt.ztitle,title=opt.title,
+                    color=opt.color)
 
         if name in self._histos.keys():
             raise KeyError("Histogram name already in used" %  name)
@@ -137,6 +167,11 @@ class HistoContainer():
         description: str, optional
             the sentence to be used when the histogram is legended,
             default ''
+        sparse: bool, optional
+            only the non-empty bins are stored (see
+            `PyAnUtils.numpyhisto.numpyhisto`), for finely binned TH2/3
+            histograms, whatever the backend is. The histogram is converted
+            to a dense ROOT.THX only when plotted or written, default False
             
         Raises
         ------
@@ -146,7 +181,6 @@ class HistoContainer():
             if optional npoints_y(z) was used but not their ranges,
             y(z)low and y(z)high
         """
-        import ROOT
         from PyAnUtils.pyanfunctions import set_attr_plotobject
         
         opt = self._opts['create_and_book_histo']
@@ -156,29 +190,33 @@ class HistoContainer():
         if name in self._histos.keys():
             raise KeyError("Histogram '{0}' already in used".format(name))
         
+        axes = [ (npoints,xlow,xhigh,None) ]
         if opt.npoints_y: 
             if opt.ylow is None or opt.yhigh is None:
                 raise RuntimeError("npoints_y option needs also"\
                         " ylow and yhigh")
+            axes.append( (opt.npoints_y,opt.ylow,opt.yhigh,None) )
             if opt.npoints_z:
                 if opt.zlow is None or opt.zhigh is None:
                     raise RuntimeError("npoints_z option needs also"\
                             " zlow and zhigh")
-                histoclass = "TH3F"
-                h = ROOT.TH3F(name,title,npoints,xlow,xhigh,\
-                        opt.npoints_y,opt.ylow,opt.yhigh,\
-                        opt.npoints_z,opt.zlow,opt.zhigh)
-            else:
-                histoclass = "TH2F"
-                h = ROOT.TH2F(name,title,npoints,xlow,xhigh,\
-                        opt.npoints_y,opt.ylow,opt.yhigh)
+                axes.append( (opt.npoints_z,opt.zlow,opt.zhigh,None) )
+        histoclass = "TH{0}F".format(len(axes))
+
+        if self._backend == 'numpy' or opt.sparse:
+            from PyAnUtils.numpyhisto import numpyhisto
+            h = numpyhisto(name,title,axes,histoclass,\
+                    storage=(opt.sparse and 'sparse') or 'dense')
+            h.setattributes(xtitle=opt.xtitle,ytitle=opt.ytitle,
+                    ztitle=opt.ztitle,title=opt.title,
+                    color=opt.color)
         else:
-            histoclass = "TH1F"
-            h = ROOT.TH1F(name,title,npoints,xlow,xhigh)
-        
-        set_attr_plotobject(h,xtitle=opt.xtitle,ytitle=opt.ytitle,
-                ztitle=opt.ztitle,title=opt.title,
-                color=opt.color)
+            import ROOT
+            h = getattr(ROOT,histoclass)(name,title,\
+                    *reduce(lambda args,axis: args+list(axis[:3]),axes,[]))
+            set_attr_plotobject(h,xtitle=opt.xtitle,ytitle=opt.ytitle,
+                    ztitle=opt.ztitle,title=opt.title,
+                    color=opt.color)
         
         self._histos[name] = h
         setattr(self,name,self._histos[name])
@@ -211,6 +249,10 @@ class HistoContainer():
         names = self._histos.keys()
         for name in names:
             self._histos.pop(name)
+        self._integrals = {}
+        self._scratch = {}
+        if self._shards is not None:
+            self._shards = {}
     
     def checkhisto(self,name):
         """Method to raise an exception if there is no histograms
@@ -308,6 +350,7 @@ class HistoContainer():
         opt.setkwd(kwd)
 
         self.checkhisto(name)
+        self._integrals.pop(name,None)
         if y is not None:
             if z is not None:
                 self._histos[name].Fill(x,y,z)
@@ -316,12 +359,400 @@ class HistoContainer():
             return 
         self._histos[name].Fill(x)
 
+    def fill_array(self,name,x,y=None,z=None,weights=None,shard=None):
+        """Fill the histogram with arrays of values in one call. The
+        values are binned with NumPy (same bin semantics than ROOT,
+        including the under/overflow bins) and the counts are added
+        directly to the bin buffer of the histogram, as well as the sum of
+        squared weights (if the histogram has it, or if it is weighted) and
+        the statistics (entries, mean, RMS, ...)
+
+        Parameters
+        ----------
+        name: str
+            name of the histogram
+        x: numpy.ndarray
+            the values of the x-axis
+        y: numpy.ndarray, optional
+            the values of the y-axis (TH2 and TH3)
+        z: numpy.ndarray, optional
+            the values of the z-axis (TH3)
+        weights: numpy.ndarray, optional
+            the weight of each value, 1 if not given
+        shard: hashable, optional
+            the shard to be filled if the sharded fill is enabled (see
+            `sharded`), default the identifier of the current thread
+
+        Raises
+        ------
+        RuntimeError
+            if the histogram is not booked
+        ValueError
+            if the number of arrays does not match the dimension of the
+            histogram, or if their lengths are different
+        TypeError
+            if the histogram is a profile
+
+        Example
+        -------
+        >>> d0 = t.read_columns('trk_d0')['trk_d0']
+        >>> h.fill_array('d0',d0.flatten())
+        """
+        import thread
+        from PyAnUtils.numpyhisto import numpyhisto,prepare_arrays,bincounts,getaxes
+
+        self.checkhisto(name)
+        self._integrals.pop(name,None)
+        h = self._histos[name]
+        if not isinstance(h,numpyhisto) and h.InheritsFrom('TProfile'):
+            raise TypeError("fill_array not available for profiles ('{0}')".format(name))
+        if self._shards is not None:
+            if shard is None:
+                shard = thread.get_ident()
+            # dict.setdefault is atomic: no lock needed to create the shards
+            shards = self._shards.get(name)
+            if shards is None:
+                shards = self._shards.setdefault(name,{})
+            hshard = shards.get(shard)
+            if hshard is None:
+                hshard = shards.setdefault(shard,numpyhisto.emptylike(h))
+            hshard.fill_array(x,y,z,weights)
+            return
+        if isinstance(h,numpyhisto):
+            h.fill_array(x,y,z,weights)
+            return
+        coords,weights = prepare_arrays(h.GetDimension(),x,y,z,weights)
+        nvalues = len(coords[0])
+        if nvalues == 0:
+            return
+
+        sumw,sumw2,newstats = bincounts(getaxes(h),coords,weights)
+        self._addtoroot(h,sumw,sumw2,newstats,nvalues,\
+                weights is not None and (weights != 1.0).any())
+
+    def _addtoroot(self,h,sumw,sumw2,newstats,nvalues,weighted):
+        """Add bin contents, sum of squared weights (None: equal to the
+        contents) and statistics of `nvalues` entries directly to the
+        buffers of the ROOT.THX histogram `h`. The Sumw2 is activated if
+        `weighted`, as in ROOT
+        """
+        import numpy as np
+        from PyAnUtils.numpyhisto import rootarray,ROOTDTYPES
+
+        # the statistics before touching the bins (if empty, ROOT obtains
+        # them from the bin contents)
+        stats = np.zeros(13)
+        h.GetStats(stats)
+        entries = h.GetEntries()
+        if h.GetSumw2N() == 0 and weighted:
+            h.Sumw2()
+
+        ncells = h.GetNcells()
+        content = rootarray(h.GetArray(),ncells,ROOTDTYPES[h.ClassName()[-1]])
+        content += sumw.astype(content.dtype)
+        if h.GetSumw2N() > 0:
+            content2 = rootarray(h.GetSumw2().GetArray(),ncells,'float64')
+            if sumw2 is None:
+                content2 += sumw
+            else:
+                content2 += sumw2
+        stats[:len(newstats)] += newstats
+        h.PutStats(stats)
+        h.SetEntries(entries+nvalues)
+
+    def sharded(self,enable=True):
+        """Enable (or disable) the sharded fill: the histograms are filled
+        with `fill_array` from several threads at once without any lock,
+        each thread (or shard, see `fill_array`) fills its own copy of the
+        bins (a `PyAnUtils.numpyhisto.numpyhisto`), and the shards are
+        summed to the histograms with `flush`, which is called as well by
+        the methods reading the histograms (`integral`, `plot`, `write_to`,
+        `merge`, pickling, ...). The direct access to the histograms
+        (attribute ``name``) needs a previous `flush`.
+        The shards are summed in the order of their keys, therefore the
+        result is identical (bit by bit) to a serial fill which follows
+        the same order: use explicit `shard` keys (for instance the index
+        of the chunk) to have reproducible results, the thread identifiers
+        change from run to run. Note that `fill` is not sharded
+
+        Parameters
+        ----------
+        enable: bool, optional
+            default True, if False the pending shards are flushed
+
+        Example
+        -------
+        >>> hc.sharded()
+        >>> def fillchunk((k,chunk)):
+        ...     hc.fill_array('mass',chunk['mass'],shard=k)
+        >>> pool = multiprocessing.pool.ThreadPool(8)
+        >>> pool.map(fillchunk,enumerate(t.iterate(100000,['mass'])))
+        >>> hc.flush()
+        """
+        if not enable:
+            self.flush()
+            self._shards = None
+        elif self._shards is None:
+            self._shards = {}
+
+    def flush(self,name=None):
+        """Sum the shards of the sharded fill (see `sharded`) to the
+        histograms, in the sorted order of the shard keys. It must not be
+        called while the histograms are still being filled
+
+        Parameters
+        ----------
+        name: str, optional
+            only the shards of this histogram, default all of them
+        """
+        import numpy as np
+        from PyAnUtils.numpyhisto import numpyhisto
+
+        if not self._shards:
+            return
+        if name is None:
+            names = self._shards.keys()
+        else:
+            names = [name]
+        for name in names:
+            shards = self._shards.pop(name,None)
+            if not shards:
+                continue
+            self._integrals.pop(name,None)
+            h = self._histos[name]
+            for key in sorted(shards.keys()):
+                hshard = shards[key]
+                if isinstance(h,numpyhisto):
+                    h.Add(hshard)
+                    continue
+                sumw,sumw2 = hshard.getarrays()
+                stats = np.zeros(13)
+                hshard.GetStats(stats)
+                self._addtoroot(h,sumw,sumw2,stats,hshard.GetEntries(),\
+                        hshard.GetSumw2N() > 0)
+
+    def _getroot(self,name):
+        """The ROOT.THX object of the histogram: the histogram itself, or
+        its conversion if it is a numpyhisto
+
+        Parameters
+        ----------
+        name: str
+            name of the histogram
+
+        Return
+        ------
+        ROOT.THX
+        """
+        from PyAnUtils.numpyhisto import numpyhisto
+
+        self.flush(name)
+        h = self._histos[name]
+        if isinstance(h,numpyhisto):
+            return h.toroot()
+        return h
+
+    def integral(self,name):
+        """The integral of the histogram (in-range bins), cached until the
+        histogram is filled again through the container (or its number of
+        entries changes)
+
+        Parameters
+        ----------
+        name: str
+            name of the histogram
+
+        Return
+        ------
+        float
+        """
+        self.checkhisto(name)
+        self.flush(name)
+        h = self._histos[name]
+        entries = h.GetEntries()
+        if not self._integrals.has_key(name) or self._integrals[name][0] != entries:
+            self._integrals[name] = (entries,h.Integral())
+        return self._integrals[name][1]
+
+    def _arrays(self,name):
+        """The bin contents and the sum of squared weights (None if not
+        stored) of the histogram, as numpy arrays (views of the ROOT
+        buffers, they must not be modified)
+        """
+        from PyAnUtils.numpyhisto import numpyhisto,rootarray,ROOTDTYPES
+
+        self.flush(name)
+        h = self._histos[name]
+        if isinstance(h,numpyhisto):
+            return h.getarrays()
+        ncells = h.GetNcells()
+        sumw2 = None
+        if h.GetSumw2N() > 0:
+            sumw2 = rootarray(h.GetSumw2().GetArray(),ncells,'float64')
+        return rootarray(h.GetArray(),ncells,ROOTDTYPES[h.ClassName()[-1]]),sumw2
+
+    def _view(self,name,kind,*args):
+        """Evaluate a view of the histogram `name` in its scratch ROOT.THX
+        (allocated once per view, and re-used). The original histogram is
+        only read
+
+        Parameters
+        ----------
+        name: str
+            name of the histogram
+        kind: str
+            'copy', 'scale' (args: factor), 'ratio' (args: denominator
+            name) or 'cumulative' (args: forward)
+
+        Return
+        ------
+        ROOT.THX: the scratch histogram, overwritten in the next evaluation
+            of the same view
+        """
+        import numpy as np
+        from PyAnUtils.numpyhisto import numpyhisto,rootarray,ROOTDTYPES
+
+        self.checkhisto(name)
+        self.flush(name)
+        h = self._histos[name]
+        # the normalization factor does not define a different view
+        key = (kind,name)+((kind != 'scale' and args) or ())
+        if not self._scratch.has_key(key):
+            if isinstance(h,numpyhisto):
+                scratch = h.toroot()
+            else:
+                scratch = h.Clone()
+                scratch.SetDirectory(0)
+            scratch.SetName('{0}__{1}'.format(name,kind))
+            if scratch.GetSumw2N() == 0:
+                scratch.Sumw2()
+            self._scratch[key] = scratch
+        scratch = self._scratch[key]
+        ncells = scratch.GetNcells()
+        content  = rootarray(scratch.GetArray(),ncells,ROOTDTYPES[scratch.ClassName()[-1]])
+        content2 = rootarray(scratch.GetSumw2().GetArray(),ncells,'float64')
+
+        sumw,sumw2 = self._arrays(name)
+        if sumw2 is None:
+            sumw2 = sumw
+        stats = np.zeros(13)
+        h.GetStats(stats)
+        if kind == 'copy' or kind == 'scale':
+            factor = (len(args) > 0 and args[0]) or 1.0
+            content[:]  = sumw*factor
+            content2[:] = sumw2*(factor*factor)
+            stats *= factor
+            stats[1] *= factor
+            scratch.PutStats(stats)
+        elif kind == 'ratio':
+            self.checkhisto(args[0])
+            densumw,densumw2 = self._arrays(args[0])
+            if densumw2 is None:
+                densumw2 = densumw
+            if len(densumw) != ncells:
+                raise ValueError("Histograms '{0}' and '{1}' with different binning".format(\
+                        name,args[0]))
+            den = densumw.astype(np.float64)
+            nonzero = den != 0
+            ratio  = np.zeros(ncells)
+            error2 = np.zeros(ncells)
+            ratio[nonzero]  = sumw[nonzero]/den[nonzero]
+            error2[nonzero] = (sumw2[nonzero]*den[nonzero]**2+densumw2[nonzero]*\
+                    sumw[nonzero].astype(np.float64)**2)/den[nonzero]**4
+            content[:]  = ratio
+            content2[:] = error2
+            scratch.ResetStats()
+        elif kind == 'cumulative':
+            if h.GetDimension() != 1:
+                raise ValueError("Cumulative view only for 1-dimensional histograms")
+            forward = args[0]
+            inner = slice(1,ncells-1)
+            if forward:
+                cumsum = lambda a: np.cumsum(a[inner])
+            else:
+                cumsum = lambda a: np.cumsum(a[inner][::-1])[::-1]
+            content[:]  = 0
+            content2[:] = 0
+            content[inner]  = cumsum(sumw.astype(np.float64))
+            content2[inner] = cumsum(sumw2)
+            scratch.ResetStats()
+        scratch.SetEntries(h.GetEntries())
+        return scratch
+
+    def normalized(self,name,norm=1.0):
+        """Normalized view of the histogram, the histogram is not modified.
+        The integral used is cached (see `integral`)
+
+        Parameters
+        ----------
+        name: str
+            name of the histogram
+        norm: float [Default: 1.0]
+            the integral of the view
+
+        Return
+        ------
+        ROOT.THX: a scratch histogram re-used in every call (copy it to
+            keep it)
+        """
+        integral = self.integral(name)
+        if integral == 0:
+            return self._view(name,'copy')
+        return self._view(name,'scale',norm/integral)
+
+    def ratio(self,num,den):
+        """View of the bin-by-bin ratio of two histograms (0 where the
+        denominator is empty), with the errors propagated as ROOT.TH1.Divide
+
+        Parameters
+        ----------
+        num: str
+            name of the numerator histogram
+        den: str
+            name of the denominator histogram
+
+        Return
+        ------
+        ROOT.THX: a scratch histogram re-used in every call (copy it to
+            keep it)
+
+        Raises
+        ------
+        ValueError
+            if the histograms have different binning
+        """
+        return self._view(num,'ratio',den)
+
+    def cumulative(self,name,forward=True):
+        """View of the cumulative distribution of a 1-dimensional histogram
+        (in-range bins)
+
+        Parameters
+        ----------
+        name: str
+            name of the histogram
+        forward: bool [Default: True]
+            accumulate from the lowest bin (True) or from the highest one
+
+        Return
+        ------
+        ROOT.THX: a scratch histogram re-used in every call (copy it to
+            keep it)
+
+        Raises
+        ------
+        ValueError
+            if the histogram is not 1-dimensional
+        """
+        return self._view(name,'cumulative',forward)
+
     def plot(self,name,plotname,canvas=None,**kwd):
         """Plot the histogram and save the ouput in the format
         especified by the suffix of the ``plotname`` argument.
         This method plot in the same canvas not only the histogram
         called but all those which were associated to it. All the
-        histograms are provisionally normalized to 1 for the plot.
+        histograms are drawn normalized to 1 (see `normalized`), without
+        modifying them.
 
         Parameters
         ----------
@@ -348,6 +779,18 @@ class HistoContainer():
         log: bool
             activate the logarithmic scale in the y-axis 
         """
+        self._render(name,[plotname],canvas,**kwd)
+
+    def _render(self,name,plotnames,canvas=None,**kwd):
+        """Draw the histogram (and its associated) once and save the
+        canvas in all the files `plotnames` (and their '_log' variants if
+        the log option is active), see `plot`
+
+        Return
+        ------
+        list(str): the files written
+        """
+        import os
         from PyAnUtils.pyanfunctions import drawlegend
         from PyAnUtils.plotstyles import setpalette
         
@@ -363,6 +806,13 @@ class HistoContainer():
         setpalette('gray')
 
         self.checkhisto(name)
+        # the ROOT objects to draw: views of the histograms (normalized if
+        # there are associated), the histograms are not modified
+        names = [name]+self._associated.get(name,[])
+        if opt.normalize and self._associated.has_key(name):
+            histos = dict(map(lambda n: (n,self.normalized(n)),names))
+        else:
+            histos = dict(map(lambda n: (n,self._view(n,'copy')),names))
         
         canvascreatedhere=False
         if not canvas:
@@ -374,36 +824,214 @@ class HistoContainer():
         orderednames = [name]
         if self._associated.has_key(name):
             unorderednames = self._associated[name]
-            # Normalization
-            if opt.normalize: 
-                oldintegral = dict(map(lambda n: (n,self._histos[n].Integral()),unorderednames))
-                __dummy = map(lambda n: self._histos[n].Scale(1.0/oldintegral[n]), unorderednames)
-            orderednames   = sorted(unorderednames,key=lambda n: self._histos[n].GetMaximum(),reverse=True)
+            orderednames   = sorted(unorderednames,key=lambda n: histos[n].GetMaximum(),reverse=True)
 
-        self._histos[orderednames[0]].Draw(opt.options)
+        histos[orderednames[0]].Draw(opt.options)
         for anotherh in orderednames[1:]:
-            self._histos[anotherh].Draw("SAME"+opt.options)
+            histos[anotherh].Draw("SAME"+opt.options)
 
+        leg = None
         if opt.legend:
             import ROOT
             leg=ROOT.TLegend()
             for n in orderednames:
-                leg.AddEntry(self._histos[n],self._description[n],"LF")
+                leg.AddEntry(histos[n],self._description[n],"LF")
                 drawlegend(leg,opt.legposition,opt.legy,textlength=opt.textlength)
-        canvas.SaveAs(plotname)
+        written = []
+        for plotname in plotnames:
+            canvas.SaveAs(plotname)
+            written.append(plotname)
         if opt.log:
             canvas.SetLogy()
-            canvas.SaveAs(plotname.replace(".","_log."))
+            for plotname in plotnames:
+                base,suffix = os.path.splitext(plotname)
+                canvas.SaveAs(base+'_log'+suffix)
+                written.append(base+'_log'+suffix)
+            canvas.SetLogy(0)
         # Deattach the legend from this canvas, otherwise violation segmentation
         canvas.Clear()
-        leg.Delete()
-        del leg
+        if leg is not None:
+            leg.Delete()
+            del leg
         if canvascreatedhere:
             del canvas
-        # Reset the actual normalization, if there was more than one histo
-        if opt.normalize:
-            if self._associated.has_key(name):
-                __dummy = map(lambda n: self._histos[n].Scale(oldintegral[n]), unorderednames)
+        return written
+
+    def _plotgroups(self):
+        """The histograms to be plotted (see `plot_all`): one per group of
+        associated histograms plus the not associated ones
+
+        Return
+        ------
+        list(str)
+        """
+        grouped = set()
+        groups  = []
+        for name in sorted(self._associated.keys()):
+            if name in grouped:
+                continue
+            groups.append(name)
+            grouped.add(name)
+            grouped.update(self._associated[name])
+        return groups+sorted(filter(lambda n: n not in grouped,self._histos.keys()))
+
+    def plot_all(self,formats=['png','pdf'],nworkers=1,outdir='.',**kwd):
+        """Plot all the histograms of the container: each group of
+        associated histograms (see `associate`) is drawn once in its canvas
+        and saved in every requested format, for both the linear and the
+        logarithmic y-axis (unless log=False). The groups are distributed
+        over a pool of processes running ROOT in batch mode
+
+        Parameters
+        ----------
+        formats: list(str) [Default: ['png','pdf']]
+            the formats (suffixes) of the output files
+        nworkers: int [Default: 1]
+            number of processes, 1 to plot in this process
+        outdir: str [Default: '.']
+            the directory of the plots, the name of each plot is the name
+            of its (first) histogram
+        kwd: 
+            the options of `plot` (log is True by default)
+
+        Return
+        ------
+        list(str): the files written
+
+        Example
+        -------
+        >>> hc.plot_all(['png','pdf'],nworkers=8,outdir='plots',normalize=False)
+        """
+        import os
+        import multiprocessing
+
+        kwd.setdefault('log',True)
+        try:
+            os.makedirs(outdir)
+        except OSError:
+            if not os.path.isdir(outdir):
+                raise IOError("Not possible to create the directory '{0}'".format(outdir))
+        tasks = []
+        for name in self._plotgroups():
+            plotnames = map(lambda fmt: os.path.join(outdir,name+'.'+fmt.lstrip('.')),formats)
+            tasks.append( (name,plotnames) )
+        if nworkers <= 1 or len(tasks) < 2:
+            written = map(lambda (name,plotnames): self._render(name,plotnames,**kwd),tasks)
+        else:
+            # only the histograms of the group are sent to the worker
+            tasks = map(lambda (name,plotnames): (self._getstate([name]+\
+                    self._associated.get(name,[])),name,plotnames,kwd),tasks)
+            pool = multiprocessing.Pool(min(nworkers,len(tasks)))
+            written = pool.map(_plotworker,tasks,chunksize=1)
+            pool.close()
+            pool.join()
+        return reduce(lambda x,y: x+y,written,[])
+
+    def merge(self,other):
+        """Add the histograms of another container to this one. The
+        histograms with the same name are summed (contents, Sumw2,
+        statistics and entries), those not present in this container are
+        copied, as well as their descriptions and associations. The
+        containers can use different backends
+
+        Parameters
+        ----------
+        other: HistoContainer
+
+        Return
+        ------
+        HistoContainer: this container
+
+        Raises
+        ------
+        ValueError
+            if two histograms with the same name have different binning
+
+        Example
+        -------
+        The partial containers filled by the workers of a pool:
+
+        >>> pool = multiprocessing.Pool(8)
+        >>> hc = mergecontainers(pool.map(fillchunk,chunks))
+        """
+        import copy
+        from PyAnUtils.numpyhisto import numpyhisto
+
+        self.flush()
+        other.flush()
+        for name,h in other._histos.iteritems():
+            self._integrals.pop(name,None)
+            if not self._histos.has_key(name):
+                if isinstance(h,numpyhisto):
+                    self._histos[name] = copy.deepcopy(h)
+                else:
+                    self._histos[name] = h.Clone()
+                setattr(self,name,self._histos[name])
+                self._class[name] = other._class[name]
+                self._description[name] = other._description[name]
+                self._usercreated[name] = False
+                continue
+            mine = self._histos[name]
+            if isinstance(mine,numpyhisto):
+                if not isinstance(h,numpyhisto):
+                    h = numpyhisto.fromroot(h)
+                mine.Add(h)
+            else:
+                if isinstance(h,numpyhisto):
+                    h = h.toroot()
+                if not mine.Add(h):
+                    raise ValueError("Histograms '{0}' with different binning".format(name))
+            if not self._description[name]:
+                self._description[name] = other._description[name]
+        for name,associated in other._associated.iteritems():
+            mine = self._associated.setdefault(name,[])
+            mine += filter(lambda n: n not in mine,associated)
+        return self
+
+    def __getstate__(self):
+        """Compact state of the container, to be pickled (for instance
+        to be sent through a multiprocessing pipe): the ROOT.THX
+        histograms are stored as `PyAnUtils.numpyhisto.numpyhisto`
+        (raw bin arrays, Sumw2 and statistics) and they are converted back
+        when unpickled
+        """
+        return self._getstate(self._histos.keys())
+
+    def _getstate(self,names):
+        """The state (see `__getstate__`) restricted to the histograms
+        `names`
+        """
+        from PyAnUtils.numpyhisto import numpyhisto
+
+        histos = {}
+        isroot = []
+        self.flush()
+        for name in names:
+            h = self._histos[name]
+            if isinstance(h,numpyhisto):
+                histos[name] = h
+            else:
+                histos[name] = numpyhisto.fromroot(h)
+                isroot.append(name)
+        select = lambda d: dict(filter(lambda (n,v): n in histos,d.iteritems()))
+        return { 'backend': self._backend, 'histos': histos, 'isroot': isroot,
+                'class': select(self._class), 'associated': select(self._associated),
+                'description': select(self._description),
+                'usercreated': select(self._usercreated) }
+
+    def __setstate__(self,state):
+        """Rebuild the container from the state given by `__getstate__`
+        """
+        self.__init__(state['backend'])
+        for name,h in state['histos'].iteritems():
+            if name in state['isroot']:
+                h = h.toroot()
+            self._histos[name] = h
+            setattr(self,name,h)
+        self._class = state['class']
+        self._associated = state['associated']
+        self._description = state['description']
+        self._usercreated = state['usercreated']
 
     def write_to(self,outputfile):
         """Write all the histograms in the container to a ROOT.TFile
@@ -423,7 +1051,46 @@ class HistoContainer():
         if efile.IsZombie():
             raise IOError("problem opening the file '{0}'".format(outputfile))
 
-        for _h in self._histos.values():
-            _h.Write("",ROOT.TObject.kOverwrite)
+        for _name in self._histos.keys():
+            self._getroot(_name).Write("",ROOT.TObject.kOverwrite)
         efile.Close()
         del efile
+
+def _plotworker(task):
+    """Plot a group of histograms in a worker process, see
+    `HistoContainer.plot_all`
+
+    Parameters
+    ----------
+    task: tuple
+        (state,name,plotnames,kwd)
+    """
+    import ROOT
+
+    state,name,plotnames,kwd = task
+    ROOT.gROOT.SetBatch(True)
+    hc = HistoContainer(state['backend'])
+    hc.__setstate__(state)
+    return hc._render(name,plotnames,**kwd)
+
+def mergecontainers(containers):
+    """Merge a list of containers (see `HistoContainer.merge`) by pairs,
+    in a fixed order (tree reduction)
+
+    Parameters
+    ----------
+    containers: list(HistoContainer)
+
+    Return
+    ------
+    HistoContainer: the merged container (the first of the list is
+        re-used)
+    """
+    containers = list(containers)
+    while len(containers) > 1:
+        merged = map(lambda k: containers[k].merge(containers[k+1]),\
+                xrange(0,len(containers)-1,2))
+        if len(containers)%2 == 1:
+            merged.append(containers[-1])
+        containers = merged
+    return containers[0]
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+""":module:`jaggedarray` -- Variable length per-event arrays backed by NumPy
+=========================================================================
+
+.. module:: jaggedarray
+      :platform: Unix
+      :synopsis: Compact representation of per-event collections (std::vector
+                 branches, xAOD containers) with two NumPy buffers: the
+                 contiguous content and the per-event offsets.
+
+       .. scriptauthor:: Jordi Duarte-Campderros <jorge.duarte.campderros@cern.ch>
+"""
+
+class jaggedarray(object):
+    """Array of variable length arrays (one per event). The values of all
+    the events are stored contiguous in the `content` buffer, and the
+    values of the event `i` are ``content[offsets[i]:offsets[i+1]]``.
+    The per-event reductions, the masking and the arithmetic are performed
+    over the whole buffers without any Python loop.
+
+    Example
+    -------
+    The d0 of the tracks of a chunk of events (see
+    `PyAnUtils.retrievetrees.storedtree.read_columns`):
+
+    >>> d0 = t.read_columns('trk_d0',0,100000)['trk_d0']
+    >>> ntracks = d0.counts()
+    >>> maxd0   = abs(d0).max()
+    >>> highd0  = d0[abs(d0) > 2.0]
+    >>> counts,edges = np.histogram(highd0.flatten(),200,(-80.,80.))
+    """
+    def __init__(self,content,offsets):
+        """Build the jagged array from its buffers
+
+        Parameters
+        ----------
+        content: numpy.ndarray
+            the values of all the events, contiguous
+        offsets: numpy.ndarray(int)
+            the N+1 offsets of the N events in `content`, starting with 0
+
+        Raises
+        ------
+        ValueError
+            if the offsets are not consistent with the content
+        """
+        import numpy as np
+
+        self.content = np.asarray(content)
+        self.offsets = np.asarray(offsets,dtype=np.int64)
+        if len(self.offsets) == 0 or self.offsets[0] != 0 or \
+                self.offsets[-1] != len(self.content):
+            raise ValueError("Offsets not consistent with a content of"\
+                    " length {0}".format(len(self.content)))
+
+    @staticmethod
+    def fromcounts(content,counts):
+        """Build the jagged array from the number of elements per event
+
+        Parameters
+        ----------
+        content: numpy.ndarray
+            the values of all the events, contiguous
+        counts: numpy.ndarray(int)
+            the number of values of each event
+        """
+        import numpy as np
+
+        offsets = np.zeros(len(counts)+1,dtype=np.int64)
+        np.cumsum(counts,out=offsets[1:])
+        return jaggedarray(content,offsets)
+
+    @staticmethod
+    def concatenate(arrays):
+        """Join several jagged arrays (chunks of events) in one
+
+        Parameters
+        ----------
+        arrays: list(jaggedarray)
+
+        Return
+        ------
+        jaggedarray
+        """
+        import numpy as np
+
+        content = np.concatenate(map(lambda a: a.content,arrays))
+        counts  = np.concatenate(map(lambda a: a.counts(),arrays))
+        return jaggedarray.fromcounts(content,counts)
+
+    def __len__(self):
+        """Number of events
+        """
+        return len(self.offsets)-1
+
+    def __repr__(self):
+        return "<jaggedarray: {0} events, {1} values>".format(len(self),len(self.content))
+
+    def counts(self):
+        """Number of values per event
+
+        Return
+        ------
+        numpy.ndarray(int)
+        """
+        import numpy as np
+        return np.diff(self.offsets)
+
+    def parents(self):
+        """The event index of each value of the content
+
+        Return
+        ------
+        numpy.ndarray(int)
+        """
+        import numpy as np
+        return np.repeat(np.arange(len(self)),self.counts())
+
+    def flatten(self):
+        """All the values, without the event structure
+
+        Return
+        ------
+        numpy.ndarray
+        """
+        return self.content
+
+    def _reduce(self,ufunc,empty):
+        """Per-event reduction with the NumPy `ufunc`, the events without
+        values get the value `empty`
+        """
+        import numpy as np
+
+        counts = self.counts()
+        nonempty = counts > 0
+        dtype = np.result_type(self.content.dtype,np.asarray(empty).dtype)
+        out = np.empty(len(self),dtype=dtype)
+        out.fill(empty)
+        if len(self.content) > 0:
+            out[nonempty] = ufunc.reduceat(self.content,self.offsets[:-1][nonempty])
+        return out
+
+    def sum(self):
+        """Per-event sum of the values (0 for empty events)
+        """
+        import numpy as np
+        return self._reduce(np.add,0)
+
+    def max(self,empty=float('-inf')):
+        """Per-event maximum of the values (`empty` for empty events)
+        """
+        import numpy as np
+        return self._reduce(np.maximum,empty)
+
+    def min(self,empty=float('inf')):
+        """Per-event minimum of the values (`empty` for empty events)
+        """
+        import numpy as np
+        return self._reduce(np.minimum,empty)
+
+    def count(self,mask=None):
+        """Per-event number of values, or of values passing `mask`
+
+        Parameters
+        ----------
+        mask: jaggedarray(bool), optional
+            with the same structure than this one
+        """
+        if mask is None:
+            return self.counts()
+        return mask.astype('int64').sum()
+
+    def astype(self,dtype):
+        """Copy of the array with the content converted to `dtype`
+        """
+        return jaggedarray(self.content.astype(dtype),self.offsets)
+
+    def apply(self,func):
+        """Apply an element-wise function (NumPy ufunc, ...) to the content,
+        keeping the event structure
+
+        Parameters
+        ----------
+        func: callable(numpy.ndarray) -> numpy.ndarray
+        """
+        return jaggedarray(func(self.content),self.offsets)
+
+    def __getitem__(self,where):
+        """Access to the array
+          * int: the values of the event (numpy.ndarray)
+          * slice: the jagged array of the events in the slice
+          * jaggedarray(bool): the values passing the per-value mask
+          * numpy.ndarray(bool|int): the events selected
+        """
+        import numpy as np
+
+        if isinstance(where,(int,long,np.integer)):
+            if where < 0:
+                where += len(self)
+            return self.content[self.offsets[where]:self.offsets[where+1]]
+        elif isinstance(where,slice):
+            start,stop,step = where.indices(len(self))
+            if step == 1:
+                # empty slices (stop before start) give an empty array
+                offsets = self.offsets[start:max(start,stop)+1]
+                return jaggedarray(self.content[offsets[0]:offsets[-1]],offsets-offsets[0])
+            where = np.arange(start,stop,step)
+        elif isinstance(where,jaggedarray):
+            if not self._samestructure(where):
+                raise ValueError("Mask with a different structure")
+            mask = where.content.astype(bool)
+            return jaggedarray.fromcounts(self.content[mask],where.astype('int64').sum())
+        where = np.asarray(where)
+        if where.dtype == bool:
+            where = np.nonzero(where)[0]
+        counts = self.counts()[where]
+        # indices of the values of the selected events
+        starts = np.repeat(self.offsets[where]-np.concatenate(([0],np.cumsum(counts)[:-1])),counts)
+        index  = starts+np.arange(counts.sum())
+        return jaggedarray.fromcounts(self.content[index],counts)
+
+    def _samestructure(self,other):
+        return len(self.offsets) == len(other.offsets) and \
+                (self.offsets == other.offsets).all()
+
+    def _binary(self,other,op):
+        """Element-wise binary operation with a scalar, a per-event array
+        (broadcasted to the values of each event) or a jagged array with
+        the same structure
+        """
+        import numpy as np
+
+        if isinstance(other,jaggedarray):
+            if not self._samestructure(other):
+                raise ValueError("Operation between jagged arrays with"\
+                        " different structure")
+            other = other.content
+        elif np.ndim(other) > 0:
+            other = np.repeat(np.asarray(other),self.counts())
+        return jaggedarray(op(self.content,other),self.offsets)
+
+    def __add__(self,other):
+        return self._binary(other,lambda a,b: a+b)
+    __radd__ = __add__
+    def __sub__(self,other):
+        return self._binary(other,lambda a,b: a-b)
+    def __rsub__(self,other):
+        return self._binary(other,lambda a,b: b-a)
+    def __mul__(self,other):
+        return self._binary(other,lambda a,b: a*b)
+    __rmul__ = __mul__
+    def __div__(self,other):
+        return self._binary(other,lambda a,b: a/b)
+    __truediv__ = __div__
+    def __rdiv__(self,other):
+        return self._binary(other,lambda a,b: b/a)
+    __rtruediv__ = __rdiv__
+    def __lt__(self,other):
+        return self._binary(other,lambda a,b: a < b)
+    def __le__(self,other):
+        return self._binary(other,lambda a,b: a <= b)
+    def __gt__(self,other):
+        return self._binary(other,lambda a,b: a > b)
+    def __ge__(self,other):
+        return self._binary(other,lambda a,b: a >= b)
+    def __eq__(self,other):
+        return self._binary(other,lambda a,b: a == b)
+    def __ne__(self,other):
+        return self._binary(other,lambda a,b: a != b)
+    def __and__(self,other):
+        return self._binary(other,lambda a,b: a & b)
+    def __or__(self,other):
+        return self._binary(other,lambda a,b: a | b)
+    def __invert__(self):
+        return jaggedarray(~self.content,self.offsets)
+    def __neg__(self):
+        return jaggedarray(-self.content,self.offsets)
+    def __abs__(self):
+        return jaggedarray(abs(self.content),self.offsets)
@@ -0,0 +1,801 @@
+#!/usr/bin/env python
+""":module:`numpyhisto` -- Histograms backed by NumPy arrays
+===========================================================
+
+.. module:: numpyhisto
+      :platform: Unix
+      :synopsis: Histograms with the booking, filling and bin semantics of
+                 the ROOT.THX (under/overflow bins, Sumw2, statistics)
+                 stored in NumPy arrays, so they can be filled without
+                 loading ROOT. They are converted to ROOT.THX objects only
+                 when needed (plotting, writing).
+
+       .. scriptauthor:: Jordi Duarte-Campderros <jorge.duarte.campderros@cern.ch>
+"""
+
+# numpy type of the bin contents of the ROOT histograms (THnC,THnS,...)
+ROOTDTYPES = { 'C': 'int8', 'S': 'int16', 'I': 'int32', 'F': 'float32', 'D': 'float64' }
+
+def getaxes(h):
+    """The binning of the axes of a ROOT.THX histogram
+
+    Return
+    ------
+    list((int,float,float,numpy.ndarray|None)): per axis, the number of
+        bins, the range and the bin edges (None for fixed size bins)
+    """
+    import numpy as np
+
+    axes = []
+    for axis in [h.GetXaxis(),h.GetYaxis(),h.GetZaxis()][:h.GetDimension()]:
+        xbins = axis.GetXbins()
+        edges = None
+        if xbins.GetSize() > 0:
+            edges = np.array(map(lambda k: xbins[k],xrange(xbins.GetSize())))
+        axes.append( (axis.GetNbins(),axis.GetXmin(),axis.GetXmax(),edges) )
+    return axes
+
+def findbins(axis,values):
+    """The bin (0: underflow, nbins+1: overflow) of each value, following
+    the ROOT.TAxis.FindBin prescription
+
+    Parameters
+    ----------
+    axis: (int,float,float,numpy.ndarray|None)
+        see `getaxes`
+    values: numpy.ndarray(float64)
+
+    Return
+    ------
+    numpy.ndarray(int64)
+    """
+    import numpy as np
+
+    nbins,xmin,xmax,edges = axis
+    bins = np.empty(len(values),dtype=np.int64)
+    with np.errstate(invalid='ignore'):
+        under = values < xmin
+        # NaN goes to the overflow, as in ROOT
+        over  = ~(values < xmax)
+    inrange = ~(under | over)
+    if edges is None:
+        bins[inrange] = 1+(nbins*(values[inrange]-xmin)/(xmax-xmin)).astype(np.int64)
+    else:
+        bins[inrange] = np.searchsorted(edges,values[inrange],side='right')
+    bins[under] = 0
+    bins[over]  = nbins+1
+    return bins
+
+def globalbins(axes,coords):
+    """The global bin of each point, in the ROOT convention
+    ``binx+(nx+2)*(biny+(ny+2)*binz)``
+
+    Parameters
+    ----------
+    axes: list
+        the axes, see `getaxes`
+    coords: list(numpy.ndarray(float64))
+        the values per axis
+
+    Return
+    ------
+    (numpy.ndarray(int64),numpy.ndarray(bool)): the global bins, and
+        whether the points are in range in all the axes
+    """
+    import numpy as np
+
+    ncells = 1
+    gbin = np.zeros(len(coords[0]),dtype=np.int64)
+    inrange = np.ones(len(coords[0]),dtype=bool)
+    for axis,values in zip(axes,coords):
+        bins = findbins(axis,values)
+        inrange &= (bins > 0) & (bins <= axis[0])
+        gbin += bins*ncells
+        ncells *= axis[0]+2
+    return gbin,inrange
+
+def fillstats(coords,weights,inrange):
+    """The statistics of the in-range values as defined by ROOT.TH1.GetStats:
+    [sumw,sumw2,sumwx,sumwx2(,sumwy,sumwy2,sumwxy(,sumwz,sumwz2,sumwxz,sumwyz))]
+
+    Return
+    ------
+    numpy.ndarray
+    """
+    import numpy as np
+
+    if weights is None:
+        w = np.ones(inrange.sum())
+    else:
+        w = weights[inrange]
+    c = map(lambda values: values[inrange],coords)
+    stats = [w.sum(),(w*w).sum(),(w*c[0]).sum(),(w*c[0]*c[0]).sum()]
+    if len(c) > 1:
+        stats += [(w*c[1]).sum(),(w*c[1]*c[1]).sum(),(w*c[0]*c[1]).sum()]
+    if len(c) > 2:
+        stats += [(w*c[2]).sum(),(w*c[2]*c[2]).sum(),(w*c[0]*c[2]).sum(),(w*c[1]*c[2]).sum()]
+    return np.array(stats)
+
+def bincounts(axes,coords,weights=None):
+    """Histogram the values in the global bins of the ROOT convention
+    (see `globalbins`)
+
+    Parameters
+    ----------
+    axes: list
+        the axes, see `getaxes`
+    coords: list(numpy.ndarray(float64))
+        the values per axis
+    weights: numpy.ndarray(float64)|None
+
+    Return
+    ------
+    (numpy.ndarray,numpy.ndarray|None,numpy.ndarray): the sum of weights
+        and the sum of squared weights (None if not weighted) per global
+        bin, and the statistics of the in-range values (see `fillstats`)
+    """
+    import numpy as np
+
+    gbin,inrange = globalbins(axes,coords)
+    ncells = reduce(lambda ncells,axis: ncells*(axis[0]+2),axes,1)
+    sumw  = np.bincount(gbin,weights=weights,minlength=ncells)
+    sumw2 = None
+    if weights is not None:
+        sumw2 = np.bincount(gbin,weights=weights*weights,minlength=ncells)
+    return sumw,sumw2,fillstats(coords,weights,inrange)
+
+def rootarray(buf,n,dtype):
+    """numpy view of the first `n` elements of a buffer returned by
+    ROOT (ROOT.TArray.GetArray)
+    """
+    import numpy as np
+    try:
+        buf.SetSize(n)
+    except AttributeError:
+        # cppyy-based PyROOT
+        buf.reshape((n,))
+    return np.frombuffer(buf,dtype=dtype,count=n)
+
+def prepare_arrays(dimension,x,y=None,z=None,weights=None):
+    """Check and convert the arrays of a bulk fill
+
+    Return
+    ------
+    (list(numpy.ndarray),numpy.ndarray|None): the values per axis and the
+        weights, as contiguous float64 arrays
+
+    Raises
+    ------
+    ValueError
+        if the number of arrays does not match the dimension, or if their
+        lengths are different
+    """
+    import numpy as np
+
+    coords = map(lambda v: np.ascontiguousarray(v,dtype=np.float64),\
+            filter(lambda v: v is not None,[x,y,z]))
+    if len(coords) != dimension:
+        raise ValueError("The histogram needs {0} arrays, {1} given".format(\
+                dimension,len(coords)))
+    if weights is not None:
+        weights = np.ascontiguousarray(weights,dtype=np.float64)
+    if len(set(map(len,coords+filter(lambda w: w is not None,[weights])))) != 1:
+        raise ValueError("Arrays with different lengths")
+    return coords,weights
+
+class numpyhisto(object):
+    """Histogram of 1, 2 or 3 dimensions with the bin contents, the sum of
+    squared weights and the statistics stored in NumPy arrays, following
+    the ROOT conventions: global bins ``binx+(nx+2)*(biny+(ny+2)*binz)``
+    with the under(0) and over(n+1) flow bins, the ROOT.TAxis.FindBin
+    binning, the Sumw2 activated with the first weighted fill, and the
+    statistics of ROOT.TH1.GetStats. The ROOT.THX-like methods (Fill,
+    GetBinContent, Integral, Scale, Add, ...) are provided, and the
+    histogram is converted to a ROOT.THX object with `toroot`.
+
+    The bins are not allocated until the first fill. With the 'sparse'
+    storage only the non-empty bins are kept (sorted global bins and their
+    contents, COO-like), useful for finely binned 2D and 3D histograms
+    which are mostly empty
+
+    Example
+    -------
+    >>> h = numpyhisto('d0','',[(100,-10.,10.,None)])
+    >>> h.Fill(0.3)
+    >>> h.fill_array(d0values)
+    >>> hroot = h.toroot()
+    """
+    # scalar fills buffered by the sparse storage before being merged
+    MAXPENDING = 4096
+
+    def __init__(self,name,title,axes,classname=None,storage='dense'):
+        """Create an empty histogram
+
+        Parameters
+        ----------
+        name: str
+            the name of the histogram
+        title: str
+            the title of the histogram
+        axes: list((int,float,float,numpy.ndarray|None))
+            one element per dimension: the number of bins, the lowest and
+            highest values, and the bin edges (or None for bins of fixed
+            size)
+        classname: str, optional
+            the ROOT class used in the conversion (see `toroot`), default
+            TH1F, TH2F or TH3F
+        storage: str, optional
+            'dense' (default) or 'sparse'
+
+        Raises
+        ------
+        ValueError
+            if the number of axes is not 1, 2 or 3, or the storage is not
+            valid
+        """
+        import numpy as np
+
+        if len(axes) not in [1,2,3]:
+            raise ValueError("Histograms of 1, 2 or 3 dimensions only")
+        if storage not in ['dense','sparse']:
+            raise ValueError("Not valid storage '{0}', use 'dense' or 'sparse'".format(storage))
+        self._name  = name
+        self._title = title
+        self._axes  = []
+        for nbins,xmin,xmax,edges in axes:
+            if edges is not None:
+                edges = np.asarray(edges,dtype=np.float64)
+            self._axes.append( (nbins,xmin,xmax,edges) )
+        self._classname = classname or 'TH{0}F'.format(len(axes))
+        self._ncells = reduce(lambda ncells,axis: ncells*(axis[0]+2),self._axes,1)
+        self._storage = storage
+        # dense: arrays of ncells (None until the first fill); sparse:
+        # contents of the global bins in _keys
+        self._sumw   = None
+        self._sumw2  = None
+        self._keys   = None
+        self._pending= []
+        if storage == 'sparse':
+            self._keys = np.zeros(0,dtype=np.int64)
+            self._sumw = np.zeros(0)
+        # activated with Sumw2 or with the first weighted fill
+        self._hassumw2 = False
+        self._stats  = np.zeros(13)
+        self._entries= 0.0
+        # plotting attributes (see setattributes)
+        self._attributes = {}
+
+    def GetName(self):
+        return self._name
+
+    def GetTitle(self):
+        return self._title
+
+    def SetTitle(self,title):
+        self._title = title
+
+    def ClassName(self):
+        return self._classname
+
+    def GetDimension(self):
+        return len(self._axes)
+
+    def GetNcells(self):
+        return self._ncells
+
+    def GetNbinsX(self):
+        return self._axes[0][0]
+
+    def GetNbinsY(self):
+        return (len(self._axes) > 1 and self._axes[1][0]) or 1
+
+    def GetNbinsZ(self):
+        return (len(self._axes) > 2 and self._axes[2][0]) or 1
+
+    def GetBin(self,binx,biny=0,binz=0):
+        """The global bin (see ROOT.TH1.GetBin)
+        """
+        return binx+(self.GetNbinsX()+2)*(biny+(self.GetNbinsY()+2)*binz)
+
+    def getstorage(self):
+        """The storage of the bins: 'dense' or 'sparse'
+        """
+        return self._storage
+
+    def nbytes(self):
+        """Memory used by the bins
+
+        Return
+        ------
+        int
+        """
+        self._compact()
+        return sum(map(lambda a: a.nbytes,filter(lambda a: a is not None,\
+                [self._sumw,self._sumw2,self._keys])))
+
+    def _allocate(self):
+        """Allocate the dense arrays (if not done yet)
+        """
+        import numpy as np
+
+        if self._sumw is None:
+            self._sumw = np.zeros(self._ncells)
+        if self._hassumw2 and self._sumw2 is None:
+            self._sumw2 = np.zeros(self._ncells)
+
+    def _accumulate(self,gbin,sumw=None,sumw2=None):
+        """Add contents to the global bins `gbin` (which can be repeated)
+
+        Parameters
+        ----------
+        gbin: numpy.ndarray(int64)
+        sumw: numpy.ndarray|None
+            the weights (None: 1 each)
+        sumw2: numpy.ndarray|None
+            the squared weights (None: equal to `sumw`)
+        """
+        import numpy as np
+
+        if sumw is None:
+            sumw = np.ones(len(gbin))
+        if sumw2 is None:
+            sumw2 = sumw
+        if self._storage == 'dense':
+            self._allocate()
+            self._sumw += np.bincount(gbin,weights=sumw,minlength=self._ncells)
+            if self._hassumw2:
+                self._sumw2 += np.bincount(gbin,weights=sumw2,minlength=self._ncells)
+            return
+        keys,index = np.unique(np.concatenate((self._keys,gbin)),return_inverse=True)
+        self._sumw = np.bincount(index,weights=np.concatenate((self._sumw,sumw)))
+        if self._hassumw2:
+            self._sumw2 = np.bincount(index,weights=np.concatenate((self._sumw2,sumw2)))
+        self._keys = keys
+
+    def _compact(self):
+        """Merge the buffered scalar fills of the sparse storage
+        """
+        import numpy as np
+
+        if len(self._pending) == 0:
+            return
+        gbin,w = map(np.array,zip(*self._pending))
+        self._pending = []
+        self._accumulate(gbin.astype(np.int64),w,w*w)
+
+    def _dense(self):
+        """The bin contents and the sum of squared weights (None if not
+        stored) as dense arrays indexed by global bin (not allocated
+        bins are returned as temporary arrays)
+        """
+        import numpy as np
+
+        if self._storage == 'dense':
+            sumw,sumw2 = self._sumw,self._sumw2
+            if sumw is None:
+                sumw = np.zeros(self._ncells)
+            if self._hassumw2 and sumw2 is None:
+                sumw2 = np.zeros(self._ncells)
+            return sumw,sumw2
+        self._compact()
+        sumw = np.zeros(self._ncells)
+        sumw[self._keys] = self._sumw
+        sumw2 = None
+        if self._hassumw2:
+            sumw2 = np.zeros(self._ncells)
+            sumw2[self._keys] = self._sumw2
+        return sumw,sumw2
+
+    def _items(self):
+        """The stored bins
+
+        Return
+        ------
+        (numpy.ndarray(int64),numpy.ndarray,numpy.ndarray|None): the global
+            bins, their contents and sum of squared weights (None if not
+            stored)
+        """
+        import numpy as np
+
+        if self._storage == 'sparse':
+            self._compact()
+            return self._keys,self._sumw,self._sumw2
+        if self._sumw is None:
+            return np.zeros(0,dtype=np.int64),np.zeros(0),None
+        return np.arange(self._ncells),self._sumw,self._sumw2
+
+    def _inrange(self):
+        """The contents of the stored in-range bins
+
+        Return
+        ------
+        (numpy.ndarray,bool): the contents, and whether there are in-range
+            bins not stored (i.e. empty)
+        """
+        import numpy as np
+
+        gbin,sumw,sumw2 = self._items()
+        inrange = np.ones(len(gbin),dtype=bool)
+        rest = gbin
+        for nbins,xmin,xmax,edges in self._axes:
+            k = rest%(nbins+2)
+            inrange &= (k > 0) & (k <= nbins)
+            rest = rest//(nbins+2)
+        values = sumw[inrange]
+        ninrange = reduce(lambda n,axis: n*axis[0],self._axes,1)
+        return values,len(values) < ninrange
+
+    def _findbin(self,coords):
+        """The global bin of a point
+        """
+        ncells = 1
+        gbin = 0
+        for (nbins,xmin,xmax,edges),value in zip(self._axes,coords):
+            if value < xmin:
+                k = 0
+            elif not value < xmax:
+                k = nbins+1
+            elif edges is None:
+                k = 1+int(nbins*(value-xmin)/(xmax-xmin))
+            else:
+                k = int(edges.searchsorted(value,side='right'))
+            gbin += k*ncells
+            ncells *= nbins+2
+        return gbin
+
+    def getarrays(self):
+        """The bin contents and the sum of squared weights (None if not
+        stored), indexed by global bin. For the sparse storage (or if the
+        histogram was not filled yet) they are temporary dense arrays
+
+        Return
+        ------
+        (numpy.ndarray,numpy.ndarray|None)
+        """
+        return self._dense()
+
+    def Sumw2(self,flag=True):
+        """Activate (or deactivate) the storage of the sum of squared
+        weights
+        """
+        if not flag:
+            self._hassumw2 = False
+            self._sumw2 = None
+        elif not self._hassumw2:
+            # the buffered fills are merged before, without sum of squares
+            self._compact()
+            self._hassumw2 = True
+            if self._sumw is not None:
+                self._sumw2 = self._sumw.copy()
+
+    def GetSumw2N(self):
+        return (self._hassumw2 and self._ncells) or 0
+
+    def Fill(self,*args):
+        """Fill the histogram with a point, as ROOT.THX.Fill:
+        Fill(x[,w]), Fill(x,y[,w]) or Fill(x,y,z[,w]) depending on the
+        dimension
+
+        Return
+        ------
+        int: the global bin filled
+        """
+        ndim = len(self._axes)
+        coords = args[:ndim]
+        w = 1.0
+        if len(args) > ndim:
+            w = args[ndim]
+        if len(coords) != ndim:
+            raise ValueError("The histogram needs {0} values, {1} given".format(\
+                    ndim,len(coords)))
+        if w != 1.0 and not self._hassumw2:
+            self.Sumw2()
+        gbin = self._findbin(coords)
+        if self._storage == 'dense':
+            self._allocate()
+            self._sumw[gbin] += w
+            if self._hassumw2:
+                self._sumw2[gbin] += w*w
+        else:
+            self._pending.append( (gbin,w) )
+            if len(self._pending) >= self.MAXPENDING:
+                self._compact()
+        self._entries += 1
+        # statistics, only in-range values
+        ncells = 1
+        for (nbins,xmin,xmax,edges) in self._axes:
+            k = (gbin//ncells)%(nbins+2)
+            if k == 0 or k == nbins+1:
+                return gbin
+            ncells *= nbins+2
+        x = coords[0]
+        st = self._stats
+        st[0] += w
+        st[1] += w*w
+        st[2] += w*x
+        st[3] += w*x*x
+        if ndim > 1:
+            y = coords[1]
+            st[4] += w*y
+            st[5] += w*y*y
+            st[6] += w*x*y
+        if ndim > 2:
+            z = coords[2]
+            st[7]  += w*z
+            st[8]  += w*z*z
+            st[9]  += w*x*z
+            st[10] += w*y*z
+        return gbin
+
+    def fill_array(self,x,y=None,z=None,weights=None):
+        """Fill the histogram with arrays of values in one call, see
+        `PyAnUtils.histocontainer.HistoContainer.fill_array`
+
+        Raises
+        ------
+        ValueError
+            if the number of arrays does not match the dimension, or if
+            their lengths are different
+        """
+        coords,weights = prepare_arrays(len(self._axes),x,y,z,weights)
+        if len(coords[0]) == 0:
+            return
+        gbin,inrange = globalbins(self._axes,coords)
+        if not self._hassumw2 and weights is not None and (weights != 1.0).any():
+            self.Sumw2()
+        if weights is None:
+            self._accumulate(gbin)
+        else:
+            self._accumulate(gbin,weights,weights*weights)
+        stats = fillstats(coords,weights,inrange)
+        self._stats[:len(stats)] += stats
+        self._entries += len(coords[0])
+
+    def GetBinContent(self,binx,biny=None,binz=None):
+        """The content of the bin, given its global bin or its bin per axis
+        """
+        if biny is not None:
+            binx = self.GetBin(binx,biny,binz or 0)
+        return self._getbin(binx,self._sumw)
+
+    def _getbin(self,gbin,values):
+        """The value of a global bin in the storage `values`
+        """
+        if values is None:
+            return 0.0
+        if self._storage == 'dense':
+            return values[gbin]
+        self._compact()
+        k = self._keys.searchsorted(gbin)
+        if k < len(self._keys) and self._keys[k] == gbin:
+            return values[k]
+        return 0.0
+
+    def GetBinError(self,binx,biny=None,binz=None):
+        """The error of the bin, given its global bin or its bin per axis
+        """
+        import math
+
+        if biny is not None:
+            binx = self.GetBin(binx,biny,binz or 0)
+        if self._hassumw2:
+            return math.sqrt(self._getbin(binx,self._sumw2))
+        return math.sqrt(abs(self._getbin(binx,self._sumw)))
+
+    def GetEntries(self):
+        return self._entries
+
+    def SetEntries(self,entries):
+        self._entries = entries
+
+    def GetStats(self,stats):
+        """Copy the statistics in the array `stats`, see ROOT.TH1.GetStats
+        """
+        stats[:] = self._stats[:len(stats)]
+
+    def PutStats(self,stats):
+        self._stats[:len(stats)] = stats
+
+    def Integral(self):
+        """The sum of the in-range bin contents
+        """
+        return self._inrange()[0].sum()
+
+    def GetMaximum(self):
+        """The maximum of the in-range bin contents
+        """
+        values,someempty = self._inrange()
+        if len(values) == 0:
+            return 0.0
+        if someempty:
+            return max(values.max(),0.0)
+        return values.max()
+
+    def GetMean(self,axis=1):
+        """The mean of the values filled in range along the `axis` (1,2,3)
+        """
+        if self._stats[0] == 0:
+            return 0.0
+        return self._stats[2*axis]/self._stats[0]
+
+    def Scale(self,c1=1.0):
+        """Multiply the contents (and the statistics) by `c1`, the Sumw2 is
+        activated if needed, as ROOT.TH1.Scale
+        """
+        if c1 != 1.0 and not self._hassumw2:
+            self.Sumw2()
+        self._compact()
+        if self._sumw is not None:
+            self._sumw *= c1
+        if self._sumw2 is not None:
+            self._sumw2 *= c1*c1
+        self._stats *= c1
+        self._stats[1] *= c1
+
+    def _checkcompatible(self,other):
+        """Raise ValueError if the binning of `other` is different
+        """
+        import numpy as np
+
+        def same(a,b):
+            return a[:3] == b[:3] and ((a[3] is None and b[3] is None) or \
+                    (a[3] is not None and b[3] is not None and np.array_equal(a[3],b[3])))
+        if len(self._axes) != len(other._axes) or \
+                not all(map(lambda (a,b): same(a,b),zip(self._axes,other._axes))):
+            raise ValueError("Histograms '{0}' and '{1}' with different binning".format(\
+                    self._name,other._name))
+
+    def Add(self,other,c1=1.0):
+        """Add the histogram `other` multiplied by `c1`, see ROOT.TH1.Add.
+        The histograms can have different storage
+
+        Raises
+        ------
+        ValueError
+            if the histograms have different binning
+        """
+        self._checkcompatible(other)
+        if not self._hassumw2 and (other._hassumw2 or c1 != 1.0):
+            self.Sumw2()
+        gbin,sumw,sumw2 = other._items()
+        if sumw2 is None:
+            sumw2 = sumw
+        if self._storage == 'sparse' and other._storage == 'dense':
+            # only the non-empty bins, to keep the sparsity
+            nonempty = (sumw != 0) | (sumw2 != 0)
+            gbin,sumw,sumw2 = gbin[nonempty],sumw[nonempty],sumw2[nonempty]
+        if len(gbin) > 0:
+            if self._storage == 'dense' and other._storage == 'dense':
+                self._allocate()
+                self._sumw += c1*sumw
+                if self._hassumw2:
+                    self._sumw2 += c1*c1*sumw2
+            else:
+                self._accumulate(gbin,c1*sumw,c1*c1*sumw2)
+        stats = c1*other._stats
+        stats[1] *= c1
+        self._stats += stats
+        self._entries += other._entries
+
+    def Reset(self):
+        """Empty the histogram (the dense bins are released until the next
+        fill)
+        """
+        import numpy as np
+
+        self._pending = []
+        if self._storage == 'dense':
+            self._sumw  = None
+            self._sumw2 = None
+        else:
+            self._keys = np.zeros(0,dtype=np.int64)
+            self._sumw = np.zeros(0)
+            self._sumw2 = None
+            if self._hassumw2:
+                self._sumw2 = np.zeros(0)
+        self._stats[:] = 0.0
+        self._entries = 0.0
+
+    def Delete(self):
+        """Release the bins
+        """
+        self.Reset()
+
+    def setattributes(self,**kwd):
+        """The plotting attributes to be set at the conversion to ROOT,
+        see `PyAnUtils.pyanfunctions.set_attr_plotobject`. The color is
+        resolved now (randomly if not given), as the ROOT histograms do
+        """
+        import random
+
+        if not kwd.get('color'):
+            kwd['color'] = int(random.uniform(1,1000))
+        self._attributes.update(kwd)
+
+    def toroot(self):
+        """Create the equivalent ROOT histogram (not attached to any
+        ROOT.TDirectory). Note that the sparse histograms are converted to
+        dense ROOT.THX as well
+
+        Return
+        ------
+        ROOT.THX
+        """
+        import ROOT
+        import numpy as np
+        from array import array
+        from PyAnUtils.pyanfunctions import set_attr_plotobject
+
+        args = []
+        if all(map(lambda axis: axis[3] is None,self._axes)):
+            for nbins,xmin,xmax,edges in self._axes:
+                args += [nbins,xmin,xmax]
+        else:
+            for nbins,xmin,xmax,edges in self._axes:
+                if edges is None:
+                    edges = np.linspace(xmin,xmax,nbins+1)
+                args += [nbins,array('d',edges)]
+        adddir = ROOT.TH1.AddDirectoryStatus()
+        ROOT.TH1.AddDirectory(False)
+        try:
+            h = getattr(ROOT,self._classname)(self._name,self._title,*args)
+        finally:
+            ROOT.TH1.AddDirectory(adddir)
+        sumw,sumw2 = self._dense()
+        content = rootarray(h.GetArray(),self._ncells,ROOTDTYPES[self._classname[-1]])
+        content[:] = sumw.astype(content.dtype)
+        if sumw2 is not None:
+            h.Sumw2()
+            rootarray(h.GetSumw2().GetArray(),self._ncells,'float64')[:] = sumw2
+        h.PutStats(self._stats.copy())
+        h.SetEntries(self._entries)
+        if self._attributes:
+            set_attr_plotobject(h,**self._attributes)
+        return h
+
+    @staticmethod
+    def emptylike(h):
+        """Create an empty numpyhisto with the binning (and storage) of
+        the histogram `h`
+
+        Parameters
+        ----------
+        h: numpyhisto|ROOT.THX
+
+        Return
+        ------
+        numpyhisto
+        """
+        if isinstance(h,numpyhisto):
+            return numpyhisto(h._name,h._title,h._axes,h._classname,h._storage)
+        return numpyhisto(h.GetName(),h.GetTitle(),getaxes(h),h.ClassName())
+
+    @staticmethod
+    def fromroot(h):
+        """Create the numpyhisto equivalent to a ROOT.THX histogram (its
+        contents, Sumw2, statistics and main plotting attributes)
+
+        Parameters
+        ----------
+        h: ROOT.THX
+
+        Return
+        ------
+        numpyhisto
+        """
+        import numpy as np
+
+        nh = numpyhisto(h.GetName(),h.GetTitle(),getaxes(h),h.ClassName())
+        ncells = h.GetNcells()
+        nh._sumw = rootarray(h.GetArray(),ncells,ROOTDTYPES[h.ClassName()[-1]]).astype(np.float64)
+        if h.GetSumw2N() > 0:
+            nh._hassumw2 = True
+            nh._sumw2 = rootarray(h.GetSumw2().GetArray(),ncells,'float64').copy()
+        h.GetStats(nh._stats)
+        nh._entries = h.GetEntries()
+        nh._attributes = { 'color': h.GetLineColor(), 'linestyle': h.GetLineStyle(),
+                'linewidth': h.GetLineWidth(), 'markerstyle': h.GetMarkerStyle(),
+                'markersize': h.GetMarkerSize(), 'title': h.GetTitle(),
+                'xtitle': h.GetXaxis().GetTitle(), 'ytitle': h.GetYaxis().GetTitle(),
+                'ztitle': h.GetZaxis().GetTitle() }
+        return nh
@@ -483,3 +483,78 @@ def psitest(predicted,observed):
     	    continue
     
     return 10.0*N_total*psib
+
+
+def getcachedir(subdir=None):
+    """Directory where the package keeps its persistent caches (entry
+    indices, schemas, ...). It is defined by the environment variable
+    PYANUTILS_CACHEDIR, default '$HOME/.pyanutils_cache'. The directory
+    is created if needed
+
+    Parameters
+    ----------
+    subdir: str, optional
+        a sub-directory inside the cache directory
+
+    Return
+    ------
+    str: the absolute path of the directory
+    """
+    import os
+    cachedir = os.getenv('PYANUTILS_CACHEDIR',\
+            os.path.join(os.path.expanduser('~'),'.pyanutils_cache'))
+    if subdir:
+        cachedir = os.path.join(cachedir,subdir)
+    try:
+        os.makedirs(cachedir)
+    except OSError:
+        # already exists
+        pass
+    return os.path.abspath(cachedir)
+
+def filesignature(filename):
+    """Signature of a file to be used as key of the persistent caches,
+    any modification of the file changes its signature
+
+    Parameters
+    ----------
+    filename: str
+        the name of the file
+
+    Return
+    ------
+    tuple(str,int,int): (absolute path, size, modification time)
+
+    Raises
+    ------
+    IOError
+        if the file does not exist
+    """
+    import os
+    try:
+        st = os.stat(filename)
+    except OSError:
+        raise IOError("File '{0}' does not exists!".format(filename))
+    return (os.path.abspath(filename),st.st_size,int(st.st_mtime))
+
+def loadcache(filename,default=None):
+    """Load a pickled cache object, return `default` if the file does not
+    exist or is corrupted
+    """
+    import cPickle
+    try:
+        with open(filename,'rb') as f:
+            return cPickle.load(f)
+    except (IOError,EOFError,cPickle.UnpicklingError):
+        return default
+
+def storecache(filename,obj):
+    """Pickle an object into a cache file. The file is written aside and
+    renamed, so concurrent readers never see a partial file
+    """
+    import os
+    import cPickle
+    tmpname = '{0}.{1}.tmp'.format(filename,os.getpid())
+    with open(tmpname,'wb') as f:
+        cPickle.dump(obj,f,cPickle.HIGHEST_PROTOCOL)
+    os.rename(tmpname,filename)
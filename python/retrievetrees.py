@@ -12,6 +12,392 @@
 from abc import ABCMeta
 from abc import abstractmethod
 
+def _readahead(filename,blocksize=4*1024*1024):
+    """Sequentially read (and discard) a file, used in a background thread
+    to bring it to the operating system page cache before ROOT opens it
+
+    Parameters
+    ----------
+    filename: str
+        the name of the file
+    blocksize: int [Default: 4 MB]
+        size of each read
+    """
+    try:
+        with open(filename,'rb') as f:
+            while f.read(blocksize):
+                pass
+    except IOError:
+        # Not a local file (xrootd, ...): nothing to do
+        pass
+
+def _mapreduceinit():
+    """Initializer of the pool processes of `storedtree.map_reduce`: the
+    cores are already used by the pool, the implicit multi-threading of
+    ROOT is disabled in the worker processes
+    """
+    from PyAnUtils import execution
+
+    execution.configure(threads=0)
+
+def _mapreduceworker(task):
+    """Process a partition of a storedtree (see `storedtree.map_reduce`)
+    in a worker process: re-create the instance and call the mapper
+
+    Parameters
+    ----------
+    task: tuple
+        (class,ctorargs,activations,mapper,rootfiles,start,stop)
+    """
+    cls,ctorargs,activations,mapper,rootfiles,start,stop = task
+    tree = cls(rootfiles,*ctorargs)
+    for varname,methodtouse,kwd in activations:
+        tree.activate_variable(varname,methodtouse,**kwd)
+    return mapper(tree,start,stop)
+
+# compiled C++ functions used by the vectorized methods, see
+# _getvectorizedmethod
+_VECTORIZEDMETHODS = {}
+
+def _getvectorizedmethod(classname,method,nocallmethod=False):
+    """Compile (once) a C++ function which evaluates `method` over all
+    the elements of a container of the class `classname` and appends the
+    results to a std::vector<double>. The function returns the number of
+    appended values. The elements can be objects or pointers to objects
+    (DataVector)
+
+    Parameters
+    ----------
+    classname: str
+        the C++ class of the container, e.g. 'DataVector<xAOD::TrackParticle_v1>'
+    method: str
+        the method (or data-member if `nocallmethod`) of the elements
+    nocallmethod: bool [Default: False]
+        whether `method` is a data-member instead of a method
+
+    Return
+    ------
+    the ROOT (cppyy) function: f(const classname&,std::vector<double>&)
+
+    Raises
+    ------
+    AttributeError
+        if the function can not be compiled (i.e. not valid method)
+    """
+    import ROOT
+
+    key = (classname,method,nocallmethod)
+    if _VECTORIZEDMETHODS.has_key(key):
+        return _VECTORIZEDMETHODS[key]
+    _declarevectorized()
+    funcname = 'eval_{0}'.format(len(_VECTORIZEDMETHODS))
+    call = nocallmethod and method or method+'()'
+    code = """
+    namespace PyAnUtilsVectorized {
+      size_t %s(const %s & c, std::vector<double> & out) {
+        const size_t before = out.size();
+        for(auto it = c.begin(); it != c.end(); ++it) {
+          out.push_back(deref(*it).%s);
+        }
+        return out.size()-before;
+      }
+    }""" % (funcname,classname,call)
+    if not ROOT.gInterpreter.Declare(code):
+        raise AttributeError("Not possible to evaluate '{0}' over the elements"\
+                " of '{1}'".format(call,classname))
+    _VECTORIZEDMETHODS[key] = getattr(ROOT.PyAnUtilsVectorized,funcname)
+    return _VECTORIZEDMETHODS[key]
+
+def _declarevectorized():
+    """Declare (once) the helpers of the vectorized C++ functions
+    """
+    import ROOT
+
+    if len(_VECTORIZEDMETHODS) > 0:
+        return
+    ROOT.gInterpreter.Declare("""
+    #include "TTree.h"
+    #include "TBranchElement.h"
+    namespace PyAnUtilsVectorized {
+      template <typename T> const T & deref(const T & t) { return t; }
+      template <typename T> const T & deref(const T * t) { return *t; }
+    }""")
+
+def _getvectorizedrange(classname,method,nocallmethod=False,auxclassname=None):
+    """Compile (once) a C++ function which evaluates `method` over all
+    the elements of a container branch for a list of entries of a tree:
+    the loop over the entries runs in C++, each entry is loaded, the aux
+    store is bound (xAOD containers) and the values of all the entries are
+    appended to the same std::vector<double>
+
+    Parameters
+    ----------
+    classname: str
+        the C++ class of the container, e.g. 'DataVector<xAOD::TrackParticle_v1>'
+    method: str
+        the method (or data-member if `nocallmethod`) of the elements
+    nocallmethod: bool [Default: False]
+        whether `method` is a data-member instead of a method
+    auxclassname: str|None [Default: None]
+        the C++ class of the aux store of the container, if any
+
+    Return
+    ------
+    the ROOT (cppyy) function: f(TTree*,branch,auxbranch,const long* entries,
+        size_t n,std::vector<double>&,long* counts)
+
+    Raises
+    ------
+    AttributeError
+        if the function can not be compiled (i.e. not valid method)
+    """
+    import ROOT
+
+    key = ('range',classname,method,nocallmethod,auxclassname)
+    if _VECTORIZEDMETHODS.has_key(key):
+        return _VECTORIZEDMETHODS[key]
+    _declarevectorized()
+    funcname = 'range_{0}'.format(len(_VECTORIZEDMETHODS))
+    call = nocallmethod and method or method+'()'
+    bind = ''
+    if auxclassname:
+        bind = """c->setStore(reinterpret_cast<%s*>(static_cast<TBranchElement*>(
+              t->GetBranch(auxname))->GetObject()));""" % auxclassname
+    code = """
+    namespace PyAnUtilsVectorized {
+      size_t %s(TTree * t, const char * bname, const char * auxname,
+          const long * entries, size_t n, std::vector<double> & out, long * counts) {
+        for(size_t k = 0; k < n; ++k) {
+          counts[k] = 0;
+          if(t->LoadTree(entries[k]) < 0) { continue; }
+          t->GetEntry(entries[k]);
+          %s * c = reinterpret_cast<%s*>(static_cast<TBranchElement*>(
+              t->GetBranch(bname))->GetObject());
+          if(!c) { continue; }
+          %s
+          const size_t before = out.size();
+          for(auto it = c->begin(); it != c->end(); ++it) {
+            out.push_back(deref(*it).%s);
+          }
+          counts[k] = out.size()-before;
+        }
+        return out.size();
+      }
+    }""" % (funcname,classname,classname,bind,call)
+    if not ROOT.gInterpreter.Declare(code):
+        raise AttributeError("Not possible to evaluate '{0}' over the elements"\
+                " of '{1}'".format(call,classname))
+    _VECTORIZEDMETHODS[key] = getattr(ROOT.PyAnUtilsVectorized,funcname)
+    return _VECTORIZEDMETHODS[key]
+
+def _vectortonumpy(vec):
+    """Copy a std::vector<double> into a numpy.ndarray
+    """
+    import numpy as np
+
+    n = vec.size()
+    if n == 0:
+        return np.zeros(0,dtype=np.float64)
+    buf = vec.data()
+    buf.SetSize(n)
+    return np.frombuffer(buf,dtype=np.float64,count=n).copy()
+
+def _evalvectorized(cppfunc,container):
+    """Evaluate a vectorized method over a container (one entry)
+
+    Return
+    ------
+    numpy.ndarray
+    """
+    import ROOT
+
+    out = ROOT.std.vector('double')()
+    _dummy = cppfunc(container,out)
+    return _vectortonumpy(out)
+
+def _skimfile(task):
+    """Write the reduced copy of one file (see `storedtree.skim`), used
+    in the worker processes
+
+    Parameters
+    ----------
+    task: tuple
+        (inputfile,outputfile,treename,branches,selection)
+
+    Return
+    ------
+    str: the output file name
+    """
+    import ROOT
+
+    infile,outfile,treename,branches,selection = task
+    fin = ROOT.TFile.Open(infile)
+    if not fin or fin.IsZombie():
+        raise IOError("problem opening the file '{0}'".format(infile))
+    t = fin.Get(treename)
+    elist = None
+    if selection:
+        # the selection is evaluated before switching off the branches,
+        # it can use branches not kept in the output
+        fin.cd()
+        t.Draw('>>skimlist',selection,'entrylist')
+        elist = fin.Get('skimlist')
+    if branches is not None:
+        t.SetBranchStatus('*',0)
+        for bname in branches:
+            t.SetBranchStatus(bname,1)
+            br = t.GetBranch(bname)
+            if br and br.GetListOfBranches().GetEntries() > 0:
+                t.SetBranchStatus(bname.rstrip('.')+'.*',1)
+    fout = ROOT.TFile.Open(outfile,'RECREATE')
+    if not fout or fout.IsZombie():
+        raise IOError("problem opening the file '{0}'".format(outfile))
+    fout.SetCompressionSettings(fin.GetCompressionSettings())
+    if elist is not None:
+        t.SetEntryList(elist)
+        out = t.CopyTree('')
+    else:
+        out = t.CloneTree(-1,'fast')
+    out.Write('',ROOT.TObject.kOverwrite)
+    fout.Close()
+    fin.Close()
+    return outfile
+
+def _leafbranches(br):
+    """The branch `br` itself and all its sub-branches (recursively) which
+    hold baskets
+
+    Return
+    ------
+    list(ROOT.TBranch)
+    """
+    branches = []
+    subbranches = br.GetListOfBranches()
+    if br.GetWriteBasket() > 0 or subbranches.GetEntries() == 0:
+        branches.append(br)
+    for sub in subbranches:
+        branches += _leafbranches(sub)
+    return branches
+
+def _timedaccessor(accessor,stats):
+    """Wrap an accessor (see `storedtree.activate_variable`) to count its
+    calls and the wall time spent on them in the dict `stats`
+    """
+    import time
+
+    def timed(*args):
+        t0 = time.time()
+        result = accessor(*args)
+        stats['time'] += time.time()-t0
+        stats['calls'] += 1
+        return result
+    return timed
+
+def _getcolumn(column,chunk):
+    """The values of a column (name or expression, see
+    `storedtree.book_histo`) in a chunk
+    """
+    if column is None:
+        return None
+    elif callable(column):
+        return column(chunk)
+    return chunk[column]
+
+def _flattenfill(coords,weights,mask):
+    """Prepare the columns of a chunk to fill an histogram: apply the
+    selection and broadcast the per-entry arrays to the per-object ones
+    (jaggedarray), returning flat arrays
+
+    Parameters
+    ----------
+    coords: list(numpy.ndarray|jaggedarray)
+        the columns of each axis
+    weights: numpy.ndarray|jaggedarray|None
+    mask: numpy.ndarray(bool)|jaggedarray(bool)|None
+        per entry or per object selection
+
+    Return
+    ------
+    (list(numpy.ndarray),numpy.ndarray|None)
+    """
+    import numpy as np
+    from PyAnUtils.jaggedarray import jaggedarray
+
+    if mask is not None and not isinstance(mask,jaggedarray):
+        mask = np.asarray(mask,dtype=bool)
+        coords = map(lambda v: v[mask],coords)
+        if weights is not None:
+            weights = weights[mask]
+        mask = None
+    jagged = filter(lambda v: isinstance(v,jaggedarray),coords+[weights,mask])
+    if len(jagged) == 0:
+        return coords,weights
+    counts = jagged[0].counts()
+    def flatten(v):
+        if isinstance(v,jaggedarray):
+            return v.content
+        return np.repeat(v,counts)
+    coords = map(flatten,coords)
+    if weights is not None:
+        weights = flatten(weights)
+    if mask is not None:
+        objmask = mask.content.astype(bool)
+        coords = map(lambda v: v[objmask],coords)
+        if weights is not None:
+            weights = weights[objmask]
+    return coords,weights
+
+class entryselection(object):
+    """The entries of a tree passing a selection (see `storedtree.select`).
+    Iterating over it gives the entry numbers
+
+    Attributes
+    ----------
+    expr: str
+        the selection expression
+    entries: numpy.ndarray(int)
+        the sorted entry numbers passing the selection
+    """
+    def __init__(self,expr,entries):
+        """
+        Parameters
+        ----------
+        expr: str
+            the selection expression
+        entries: numpy.ndarray(int)
+            the sorted entry numbers passing the selection
+        """
+        self.expr = expr
+        self.entries = entries
+        self._entrylist = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries.tolist())
+
+    def getentrylist(self,chain):
+        """The ROOT.TEntryList of the selection for `chain`, built (in C++)
+        the first time is called
+        """
+        import ROOT
+
+        if self._entrylist is None:
+            if not hasattr(ROOT,'PyAnUtilsFillEntryList'):
+                ROOT.gInterpreter.Declare("""
+                void PyAnUtilsFillEntryList(TEntryList * el, TChain * ch,
+                        const Long64_t * entries, Long64_t n) {
+                  for(Long64_t k = 0; k < n; ++k) {
+                    el->Enter(entries[k],ch);
+                  }
+                }""")
+            self._entrylist = ROOT.TEntryList('selection','{0}'.format(self.expr))
+            # not owned by the current directory (an output file would delete it)
+            self._entrylist.SetDirectory(0)
+            ROOT.PyAnUtilsFillEntryList(self._entrylist,chain,self.entries,len(self.entries))
+        return self._entrylist
+
 class storedtree(object):
     """Abstract class to implement the retrieval of a tree-type (n-tuple) root file.
     The concrete classes should implement the relative methods dependents of the
@@ -33,8 +419,11 @@ class storedtree(object):
          * getmctruthinfo
          * setuptree
         """
-        import ROOT
-        import os
+        from PyAnUtils.chainindex import chainindex
+        from PyAnUtils import execution
+
+        # implicit multi-threading, see PyAnUtils.execution
+        execution.apply()
 
         # should be a list
         if type(rootfiles) is not list:
@@ -42,21 +431,57 @@ class storedtree(object):
         else:
             self._rootfiles = rootfiles
 
-        self._tree = ROOT.TChain(chainname)
+        # Note that an IOError is raised if any file does not exist
+        self._chainindex = chainindex(chainname,self._rootfiles)
+        self._tree = self._chainindex.buildchain()
         print "TChain '%s' created" % chainname
         print "Adding %i root files to the tree" % len(self._rootfiles)
-        for i in sorted(self._rootfiles):
-            # is there a file?
-            if not os.path.exists(i):
-                raise IOError("ROOT file '{0}' does not exists!".format(i))
-            self._tree.AddFile(i)
         
         self._plotsactivated = False
-        self._nentries   = self._tree.GetEntries()
+        # lazy evaluated, see getentries
+        self._nentries   = None
         self._wise_values= {}
         self._aliases    = {}
+        # alias --> name of the branch in the tree
+        self._branchnames= {}
+        # alias_method --> (alias, methodname, method, nocallmethod, isvector)
+        self._methods    = {}
+        # alias_method --> compiled function (see activate_variable)
+        self._vectorized = {}
         self._currententry = -1
         self._aux_associated = {}
+        # alias --> name of the Aux. branch (xAOD containers)
+        self._auxbranchnames = {}
+        # branch --> name of its Aux. branch (xAOD containers)
+        self._auxpairs = {}
+        # attribute --> branch, resolved on first access (see __getattr__)
+        self._lazyattrs = {}
+        # alias --> entry for which the aux store was bound
+        self._auxbound = {}
+        # learning mode status, see learn_branches
+        self._learning = None
+        # cache and read-ahead status, see configure_cache
+        self._cacheconfig = None
+        self._readahead = None
+        # the arguments (but the files) of the concrete class constructor
+        # and the activate_variable calls, used to re-create the instance
+        # in other processes (see map_reduce)
+        self._ctorargs = ()
+        self._activations = []
+        # friend name --> (storedtree, entry mapping|None), see add_friend
+        self._friends = {}
+        # friend name --> whether the current entry has a match in the
+        # friend, see friendmatched
+        self._friendmatch = {}
+        # the active selection, see select
+        self._selection = None
+        # I/O instrumentation, see profile
+        self._profile = None
+        # lazy evaluated, see getschema
+        self._schema = None
+        # histogram name --> (columns,weight,selection,expression columns),
+        # see book_histo
+        self._histobindings = {}
         # The self._vars attribute is created in the concrete implementations
     
     #def __iter__(self):
@@ -93,6 +518,12 @@ class storedtree(object):
             a short name to be used as attribute instead of `methodtouse`
         nocallmethod: bool, optional
             whether the method `methodtouse` should not be called or yes, i.e.
+        vectorized: bool, optional [Default: False]
+            the method is evaluated over the whole container of the current
+            entry by a compiled C++ loop, and the accessor returns a
+            numpy.ndarray (it does not need any index). It is also used by
+            `read_columns` to fill whole chunks of events. Only valid for
+            containers (isvector=True)
 
         Examples
         --------
@@ -113,6 +544,11 @@ class storedtree(object):
         To obtain the d0 of the i-track in the j-event:
         >>> a.getentry(j)
         >>> a.InDetHighD0TrackParticles_d0(i)
+
+        Or the d0 of all the tracks of the j-event as a numpy.ndarray:
+        >>> a.activate_variable('InDetHighD0TrackParticles','d0',vectorized=True)
+        >>> a.getentry(j)
+        >>> a.InDetHighD0TrackParticles_d0()
         
         Raises
         ------
@@ -130,8 +566,9 @@ class storedtree(object):
         """
         from PyAnUtils.pyanfunctions import ExtraOpt
         opt = ExtraOpt( [('alias',None), ('isvector',True), \
-                ('methodshort',None), ('nocallmethod',False)] )
+                ('methodshort',None), ('nocallmethod',False), ('vectorized',False)] )
         opt.setkwd(kwd)
+        self._activations.append( (varname,methodtouse,kwd) )
         
         if not opt.alias:
             aliasname = varname
@@ -139,6 +576,9 @@ class storedtree(object):
             aliasname = opt.alias
             # Not needed below line... to be deprecated this data-member
             self._aliases[aliasname] = opt.alias
+        self._branchnames[aliasname] = varname
+        if self._auxpairs.has_key(varname):
+            self._auxbranchnames[aliasname] = self._auxpairs[varname]
 
         methodimpl = methodtouse
         if opt.methodshort:
@@ -148,30 +588,50 @@ class storedtree(object):
 
         if opt.isvector:
             if opt.nocallmethod:
-                extractfunc = lambda k: getattr(self._wise_values[aliasname][0][k],methodimpl)
+                extractfunc = lambda k: getattr(self._container(aliasname)[k],methodimpl)
             else:
-                extractfunc = lambda k: getattr(self._wise_values[aliasname][0][k],methodimpl)()
+                extractfunc = lambda k: getattr(self._container(aliasname)[k],methodimpl)()
         else:
-            extractfunc = lambda k=None: getattr(self._wise_values[aliasname][0],methodimpl)
+            extractfunc = lambda k=None: getattr(self._container(aliasname),methodimpl)
         
         # First initialization
         if not self._wise_values.has_key(aliasname):
             # Note that an exception will be raised by ROOT if the attribute 
             # doesn't exist in the TTree
             self._wise_values[aliasname] = (getattr(self._tree,varname),{})
-            # Also create an accessor
-            setattr(self,aliasname,self._wise_values[aliasname][0])
-            # Be careful, only if is a vector make sense
-            try:
-                setattr(self,aliasname+'_size',self._wise_values[aliasname][0].size)
-            except AttributeError:
-                pass
+            if self._auxbranchnames.has_key(aliasname):
+                # xAOD containers: the accessor is served by __getattr__,
+                # binding the aux store when accessed (see _container)
+                self._lazyattrs[aliasname] = varname
+                setattr(self,aliasname+'_size',lambda: self._container(aliasname).size())
+            else:
+                # Also create an accessor
+                setattr(self,aliasname,self._wise_values[aliasname][0])
+                # Be careful, only if is a vector make sense
+                try:
+                    setattr(self,aliasname+'_size',self._wise_values[aliasname][0].size)
+                except AttributeError:
+                    pass
 
         # Just initialize the variable
         if not methodtouse:
             return
 
+        if opt.vectorized:
+            if not opt.isvector:
+                raise RuntimeError("The 'vectorized' option is only valid"\
+                        " for containers (isvector=True)")
+            # Note that a AttributeError is raised if the method is not valid
+            cppfunc = _getvectorizedmethod(self.getschema().getclassname(varname),\
+                    methodimpl,opt.nocallmethod)
+            self._vectorized[aliasname+'_'+methodname] = cppfunc
+            extractfunc = lambda: _evalvectorized(cppfunc,self._container(aliasname))
         self._wise_values[aliasname][1][methodname] = extractfunc
+        self._methods[aliasname+'_'+methodname] = (aliasname,methodname,
+                methodimpl,opt.nocallmethod,opt.isvector)
+        if opt.vectorized:
+            setattr(self,aliasname+'_'+methodname,extractfunc)
+            return
         # how to obtain the variable from the tree: methodtouse, check it if
         # is works
         if self._currententry == -1:
@@ -185,8 +645,23 @@ class storedtree(object):
     def activate_all_variables(self):
         """
         """
-        for tbranch in self._tree.GetListOfBranches():
-            self.activate_variable(tbranch.GetName())
+        for bname in self.getschema().branchnames():
+            self.activate_variable(bname)
+
+    def getschema(self):
+        """The schema of the tree (branch names, types, split levels and
+        aux pairings), obtained without opening the files if it is already
+        in the cache, see `PyAnUtils.treeschema`
+
+        Return
+        ------
+        PyAnUtils.treeschema.treeschema
+        """
+        from PyAnUtils.treeschema import getschema
+
+        if self._schema is None:
+            self._schema = getschema(self._chainindex._treename,self._rootfiles)
+        return self._schema
 
     def deactivate_variable(self,varname):
         """
@@ -198,85 +673,474 @@ class storedtree(object):
         self._tree.SetBranchStatus(varname+'*',0)
 
     def deactivate_all_unused_variables(self):
-        """
+        """Switch off (ROOT.TTree.SetBranchStatus) all the branches of the
+        tree which have not been activated (see `activate_variable`)
+
+        Return
+        ------
+        list(str): the names of the deactivated branches
         """
         # get the actual branch names, not an alias if were used
-        nameoftheusedbranches = map(lambda x: x.GetName(), self._wise.values.values())
+        nameoftheusedbranches = self._usedbranches(self._wise_values.keys())
         deactivated = []
-        for tbranch in self._tree.GetListOfBranches():
-            if tbranch.GetName() not in nameoftheusedbranches:
-                self.deactivate_variable(tbranch.GetName())
-                deactivated.append(tbranch.GetName())
-        # Print deactivated info if we want...a
-
-    #def book_histo(self,histo,*variablenames):
-    #    """Associate an histogram (ROOT.THXF) to a list of 
-    #    variables. Each histogream is going to be filled when
-    #    the method fill_all_histos is called. Note that more
-    #    complicated syntax is allowed with the optional parameter 
-    #    `method`. 
-
-    #    Parameters
-    #    ----------
-    #    histo: ROOT.THXF
-    #        the histogram (X=1,2,3)
-    #    variablenames: (str[,str,..])
-    #        the link between the histogram and the variables of this
-    #        ntuple. The variable should be of the type varname_method 
-    #        (see method `activate_variable`)
+        for bname in self.getschema().branchnames():
+            if bname not in nameoftheusedbranches:
+                self._tree.SetBranchStatus(bname+'*',0)
+                deactivated.append(bname)
+        return deactivated
 
-    #    """
-    #    # First check the existence of the variables
-    #    listofgetters = []
-    #    for varname in variablenames:
-    #        if not hasattr(self,varname):
-    #            raise AttributeError("Variable '%s' not activated" % varname)
-    #        listofgetters.append(getattr(self,varname))
+    def _trackedattributes(self):
+        """Build the map between the accessors (attributes) of the instance
+        and the branch of the tree they are reading
 
-    #    self._histos.append( (histo,listofgetters) )
+        Return
+        ------
+        dict(str,str): { 'attribute': 'alias', ... }
+        """
+        tracked = {}
+        for aliasname in self._branchnames.keys():
+            tracked[aliasname] = aliasname
+            tracked[aliasname+'_size'] = aliasname
+        for accessor,info in self._methods.iteritems():
+            tracked[accessor] = info[0]
+        return tracked
 
+    def _usedbranches(self,aliases):
+        """The list of branch names needed to read the aliases, including
+        the auxiliary store of the xAOD containers
+        """
+        used = set()
+        for aliasname in aliases:
+            used.add(self._branchnames.get(aliasname,aliasname))
+            if self._auxbranchnames.has_key(aliasname):
+                used.add(self._auxbranchnames[aliasname])
+        return used
 
-    #def book_histos(self,hc,histoVarMap):
-    #    """
-    #    Parameters
-    #    ----------
-    #    hc: PyAnUtils.HistoContainer
-    #        the container of histograms already initialized and ready to
-    #        be filled
-    #    histoVarMap: dict( (str,str) )
-    #        the link between the histogram names and the variable names.
-    #        Every histogram name (key of the dict) is pointing to the 
-    #        variable (or list of variables) which should be filled every
-    #        call to the 'fill' method
-
-    #    Note
-    #    ----
-    #    The name of the histograms should match the name of the 
-    #    activated variables because this is the way they are going
-    #    to be filled
-    #    """
-    #    # Perform some consistency checks
-    #    for hname, variables in histoVarMap.iteritems():
-    #        hc.checkhisto(hname)
-    #        # Checking variables exist
-    #        if type(variables) is str:
-    #            if variables not in self._wise_values.keys():
-    #                raise AttributeError("Not variable named '%s' has been"\
-    #                        " activated" % variables)
-    #        elif type(variables) is tuple:
-    #            for var in variables:
-    #                if var not in self._wise_values.keys():
-    #                    raise AttributeError("Not variable named '%s' has been"\
-    #                            " activated" % var)
-    #        else:
-    #            raise RuntimeError("Not valid type for '%s'. Only str or tuple(str)"\
-    #                    " are accepted" % variables)
-
-    #        self._histos[variables] = getattr(hc,hname)
-    
-    def getentries(self):
+    def learn_branches(self,nentries=100):
+        """Start the learning mode: during the next `nentries` calls to
+        `getentry` the accessors of the instance (activated variables,
+        methods and xAOD containers) which are actually used are recorded.
+        After that, all the other branches are switched off and the
+        ROOT.TTreeCache is set up for exactly the used ones (see
+        `prune_branches`).
+
+        Parameters
+        ----------
+        nentries: int [Default: 100]
+            number of entries to learn from
+
+        Examples
+        --------
+        >>> t = plaintree(files,'RPVMCInfoTree')
+        >>> t.learn_branches(50)
+        >>> for i in xrange(t.getentries()):
+        ...     t.getentry(i)
+        ...     h.Fill(t.dv_X[0])
+
+        Notes on implementation
+        -----------------------
+        The accessors are removed from the instance dictionary during the
+        learning, so they are served (and recorded) by `__getattr__`. Once
+        finished the attributes are restored and no overhead is left.
+        """
+        if nentries < 1:
+            raise ValueError("Invalid number of entries '{0}'".format(nentries))
+        if self._learning:
+            self._stoplearning(prune=False)
+        learning = { 'remaining': nentries, 'used': set(), 'hidden': {} }
+        for attr,aliasname in self._trackedattributes().iteritems():
+            if self.__dict__.has_key(attr):
+                learning['hidden'][attr] = (aliasname,self.__dict__.pop(attr))
+        self._learning = learning
+
+    def __getattr__(self,name):
+        """Only reached when an attribute is not found, i.e. serving the
+        accessors hidden during the learning mode (see `learn_branches`)
+        and the containers resolved on demand (see `_getcontainer`)
+        """
+        learning = self.__dict__.get('_learning')
+        if learning and learning['hidden'].has_key(name):
+            aliasname,obj = learning['hidden'][name]
+            learning['used'].add(aliasname)
+            return obj
+        lazyattrs = self.__dict__.get('_lazyattrs')
+        if lazyattrs and lazyattrs.has_key(name):
+            if learning:
+                learning['used'].add(name)
+            return self._getcontainer(name)
+        raise AttributeError("'{0}' object has no attribute '{1}'".format(\
+                self.__class__.__name__,name))
+
+    def _getcontainer(self,name):
+        """Resolve a container of the tree (xAOD), binding its aux store
+        if it was not yet done for the current entry. The containers without
+        aux store become plain attributes of the instance after the first
+        access
+
+        Parameters
+        ----------
+        name: str
+            the attribute name of the container
+        """
+        if self._wise_values.has_key(name):
+            return self._container(name)
+        obj = getattr(self._tree,self._lazyattrs[name])
+        if not self._auxbranchnames.has_key(name):
+            if not self._learning:
+                setattr(self,name,obj)
+            return obj
+        if self._auxbound.get(name) != self._currententry:
+            if not self._aux_associated.has_key(name):
+                self._aux_associated[name] = getattr(self._tree,self._auxbranchnames[name])
+            obj.setStore(self._aux_associated[name])
+            self._auxbound[name] = self._currententry
+        return obj
+
+    def _stoplearning(self,prune=True):
+        """Finish the learning mode, restoring the accessors and pruning
+        the tree to the used branches (if `prune`)
+        """
+        learning = self._learning
+        self._learning = None
+        for attr,(aliasname,obj) in learning['hidden'].iteritems():
+            setattr(self,attr,obj)
+        if prune and len(learning['used']) > 0:
+            self.prune_branches(self._usedbranches(learning['used']))
+
+    def prune_branches(self,branches,cachesize=None):
+        """Switch off all the branches of the tree but `branches` and set
+        up the ROOT.TTreeCache to prefetch exactly those
+
+        Parameters
+        ----------
+        branches: list(str)
+            the name of the branches (in the tree) to be kept
+        cachesize: int|None [Default: None]
+            size in bytes of the ROOT.TTreeCache, if None the one given
+            in `configure_cache` or 30 MB
+        """
+        if cachesize is None:
+            if self._cacheconfig:
+                cachesize = self._cacheconfig['cachesize']
+            else:
+                cachesize = 30*1024*1024
+        self._tree.SetBranchStatus('*',0)
+        for bname in branches:
+            self._tree.SetBranchStatus(bname,1)
+            br = self._tree.GetBranch(bname)
+            if br and br.GetListOfBranches().GetEntries() > 0:
+                # the sub-branches of split objects (xAOD Aux. stores)
+                self._tree.SetBranchStatus(bname.rstrip('.')+'.*',1)
+        self._tree.SetCacheSize(cachesize)
+        for bname in branches:
+            self._tree.AddBranchToCache(bname,True)
+        self._tree.StopCacheLearningPhase()
+        # Force the re-read of the current entry with the new status
+        self._currententry = -1
+
+    def configure_cache(self,cachesize=30*1024*1024,learnentries=100,\
+            branches=None,readahead=False):
+        """Tune the ROOT.TTreeCache of the chain
+
+        Parameters
+        ----------
+        cachesize: int [Default: 30 MB]
+            size in bytes of the ROOT.TTreeCache, 0 disables the cache
+        learnentries: int [Default: 100]
+            number of entries used by ROOT to learn which branches should
+            be prefetched. Not used if `branches` are given
+        branches: list(str)|True|None [Default: None]
+            explicit list of variables (aliases or branch names) to add
+            to the cache, stopping the ROOT learning phase. If True, all
+            the activated variables (see `activate_variable`) are used
+        readahead: bool [Default: False]
+            whether to read in background the next file of the chain
+            while the current one is processed, so the operating system
+            page cache is already warm when the chain moves to it
+
+        Examples
+        --------
+        >>> t.activate_variable('decayLength')
+        >>> t.activate_variable('mass')
+        >>> t.configure_cache(cachesize=100*1024*1024,branches=True,readahead=True)
+        >>> # ... loop ...
+        >>> print t.cache_report()
         """
+        self._tree.SetCacheSize(cachesize)
+        self._cacheconfig = { 'cachesize': cachesize, 'learnentries': learnentries,
+                'readahead': readahead }
+        if cachesize > 0:
+            if branches is True:
+                branches = self._wise_values.keys()
+            if branches:
+                for bname in self._usedbranches(branches):
+                    self._tree.AddBranchToCache(bname,True)
+                self._tree.StopCacheLearningPhase()
+            else:
+                self._tree.SetCacheLearnEntries(learnentries)
+        self._readahead = None
+        if readahead:
+            # the tree number which has triggered the read-ahead
+            self._readahead = { 'treenumber': -1, 'thread': None }
+
+    def _launchreadahead(self):
+        """Start the background read of the file which follows the
+        current one in the chain, if not done yet (see `configure_cache`)
         """
+        import threading
+
+        treenumber = self._tree.GetTreeNumber()
+        if treenumber == self._readahead['treenumber']:
+            return
+        self._readahead['treenumber'] = treenumber
+        filelist = self._tree.GetListOfFiles()
+        if treenumber+1 >= filelist.GetEntries():
+            return
+        nextfile = filelist.At(treenumber+1).GetTitle()
+        th = threading.Thread(target=_readahead,args=(nextfile,))
+        th.daemon = True
+        th.start()
+        self._readahead['thread'] = th
+
+    def cache_report(self):
+        """Summary of the I/O performed through the ROOT.TTreeCache of
+        the current file of the chain, to be used to size the cache
+
+        Return
+        ------
+        dict: with keys
+            'cachesize': size in bytes of the cache
+            'hitrate': fraction of the prefetched baskets which were used
+                       (ROOT.TTreeCache.GetEfficiency)
+            'hitraterel': fraction of the baskets read which were found in
+                       the cache (ROOT.TTreeCache.GetEfficiencyRel)
+            'bytesread': total bytes read from the files
+            'readcalls': total number of read calls to the files
+        """
+        import ROOT
+
+        report = { 'cachesize': self._tree.GetCacheSize(), 'hitrate': 0.0,
+                'hitraterel': 0.0,
+                'bytesread': ROOT.TFile.GetFileBytesRead(),
+                'readcalls': ROOT.TFile.GetFileReadCalls() }
+        currentfile = self._tree.GetCurrentFile()
+        if currentfile:
+            cache = currentfile.GetCacheRead(self._tree.GetTree())
+            if cache and cache.InheritsFrom('TTreeCache'):
+                report['hitrate'] = cache.GetEfficiency()
+                report['hitraterel'] = cache.GetEfficiencyRel()
+        return report
+
+    def getclusters(self):
+        """The ROOT basket clusters of the chain, i.e. the entry ranges
+        which can be read independently without sharing baskets. They are
+        kept in the persistent index of the chain, so the files are only
+        opened the first time (see `PyAnUtils.chainindex.chainindex.getclusters`)
+
+        Return
+        ------
+        list((int,int)): [ (firstentry,lastentry+1), ... ] in global
+            entry numbers of the chain
+        """
+        # be sure all the files are in the index
+        _dummy = self.getentries()
+        return self._chainindex.getclusters()
+
+    def map_reduce(self,mapper,reducer,nworkers=None,partition='file'):
+        """Run `mapper` over the chain split in partitions, in a pool of
+        `nworkers` processes, and combine the partial results with
+        `reducer`. Each worker re-creates its own instance (and ROOT.TChain)
+        with the same concrete class, constructor arguments and activated
+        variables than this one.
+
+        Parameters
+        ----------
+        mapper: callable(storedtree,int,int) -> result
+            called as `mapper(tree,start,stop)` for each partition, it
+            must process the entries [start,stop) of `tree`. It has to be
+            picklable (i.e. a module-level function)
+        reducer: callable(result,result) -> result
+            combines two partial results (histograms, counters, arrays..),
+            it is called in this process in the order of the partitions
+        nworkers: int|None [Default: None]
+            number of processes, if None the number of cpus. If 1, the
+            partitions are processed in this process
+        partition: str [Default: 'file']
+            'file': one partition per file, the worker opens only that file
+            'cluster': partitions made of consecutive ROOT basket clusters
+                       (see `getclusters`), balanced between the workers
+
+        Return
+        ------
+        the reduced result, None if the chain is empty
+
+        Raises
+        ------
+        ValueError
+            if `partition` is not 'file' or 'cluster'
+
+        Examples
+        --------
+        >>> def masshisto(t,start,stop):
+        ...     return np.histogram(t.read_columns('mass',start,stop)['mass'],\
+        ...             100,(350.,650.))[0]
+        >>> counts = t.map_reduce(masshisto,operator.add,nworkers=32)
+        """
+        import multiprocessing
+
+        if nworkers is None:
+            nworkers = multiprocessing.cpu_count()
+        _dummy = self.getentries()
+        base = (self.__class__,self._ctorargs,self._activations,mapper)
+        if partition == 'file':
+            tasks = map(lambda (fname,offset,n): base+([fname],0,n),\
+                    self._chainindex.getfileentries())
+        elif partition == 'cluster':
+            clusters = self.getclusters()
+            # a few tasks per worker to balance the load
+            ntasks = min(len(clusters),4*nworkers)
+            tasks = []
+            for k in xrange(ntasks):
+                group = clusters[k*len(clusters)//ntasks:(k+1)*len(clusters)//ntasks]
+                tasks.append( base+(sorted(self._rootfiles),group[0][0],group[-1][1]) )
+        else:
+            raise ValueError("Invalid partition '{0}', valid: 'file' or"\
+                    " 'cluster'".format(partition))
+
+        pool = None
+        if nworkers == 1 or len(tasks) <= 1:
+            results = map(_mapreduceworker,tasks)
+        else:
+            pool = multiprocessing.Pool(min(nworkers,len(tasks)),_mapreduceinit)
+            results = pool.imap(_mapreduceworker,tasks)
+            pool.close()
+        # the partial results are reduced as soon as they arrive
+        reduced = None
+        for partial in results:
+            if reduced is None:
+                reduced = partial
+            elif partial is not None:
+                reduced = reducer(reduced,partial)
+        if pool:
+            pool.join()
+        return reduced
+
+    def book_histo(self,hname,x,y=None,z=None,weight=None,selection=None,columns=None):
+        """Associate an histogram of a HistoContainer to the columns of
+        the tree. All the booked histograms are filled together, in one
+        pass over the tree, with `fill_histograms`.
+        The columns (x,y,z,weight) are any column accepted by
+        `read_columns` (branch names, aliases, methods 'varname_method',
+        friend columns 'friendname.column') or expressions, i.e. functions
+        of the chunk of columns (dict) returning a numpy.ndarray or a
+        jaggedarray. The per-entry columns are broadcasted to the
+        per-object ones (jaggedarray), so a per-object histogram can be
+        weighted with a per-event weight
+
+        Parameters
+        ----------
+        hname: str
+            the name of the histogram in the HistoContainer
+        x: str|callable
+            the column of the x-axis
+        y: str|callable|None [Default: None]
+            the column of the y-axis (TH2 and TH3)
+        z: str|callable|None [Default: None]
+            the column of the z-axis (TH3)
+        weight: str|callable|None [Default: None]
+            the weight column
+        selection: str|callable|None [Default: None]
+            a TTreeFormula expression, or a function of the chunk returning
+            a boolean numpy.ndarray (per entry) or jaggedarray (per object)
+        columns: list(str)|None [Default: None]
+            the columns used by the expressions (callables) in x, y, z,
+            weight or selection, they are read together with the others
+
+        Examples
+        --------
+        >>> t.book_histo('d0','trk_d0',weight='weight.w',selection='nvtx > 0')
+        >>> t.book_histo('d0_high','trk_d0',selection=lambda c: abs(c['trk_d0']) > 2.0)
+        >>> t.book_histo('d0z0','trk_d0','trk_z0')
+        >>> t.book_histo('pt_gev',lambda c: c['trk_pt']*1e-3,columns=['trk_pt'])
+        >>> t.fill_histograms(hc)
+        """
+        if type(columns) is str:
+            columns = [columns]
+        self._histobindings[hname] = (filter(lambda v: v is not None,[x,y,z]),\
+                weight,selection,columns or [])
+
+    def book_histos(self,histovarmap):
+        """Book several histograms at once, see `book_histo`
+
+        Parameters
+        ----------
+        histovarmap: dict(str,str|tuple|dict)
+            the link between the histogram names and their columns: the
+            x column, a tuple with the (x,y[,z]) columns or a dict with the
+            `book_histo` arguments (x,y,z,weight,selection,columns)
+        """
+        for hname,variables in histovarmap.iteritems():
+            if type(variables) is dict:
+                self.book_histo(hname,**variables)
+            elif type(variables) is tuple:
+                self.book_histo(hname,*variables)
+            else:
+                self.book_histo(hname,variables)
+
+    def fill_histograms(self,hc,chunk_size=100000,start=0,stop=None):
+        """Fill all the histograms booked with `book_histo` in a single
+        pass over the tree: the columns needed by all of them are read
+        together chunk by chunk (see `iterate`) and each histogram is
+        filled with one call per chunk (see
+        `PyAnUtils.histocontainer.HistoContainer.fill_array`)
+
+        Parameters
+        ----------
+        hc: PyAnUtils.histocontainer.HistoContainer
+            the container of the booked histograms
+        chunk_size: int [Default: 100000]
+            number of entries per chunk
+        start: int [Default: 0]
+            first entry
+        stop: int|None [Default: None]
+            last entry (not included), if None the entries of the tree
+
+        Raises
+        ------
+        RuntimeError
+            if any of the booked histograms is not in the container
+        """
+        # the columns to read (the expressions are evaluated in the chunk)
+        columns = set()
+        for hname,(values,weight,selection,needed) in self._histobindings.iteritems():
+            hc.checkhisto(hname)
+            columns.update(filter(lambda v: type(v) is str,values+[weight]))
+            columns.update(needed)
+        if stop is None or stop > self.getentries():
+            stop = self.getentries()
+        first = start
+        for chunk in self.iterate(chunk_size,sorted(columns),start,stop):
+            last = min(first+chunk_size,stop)
+            # the selections shared by several histograms are evaluated once
+            masks = {}
+            for hname,(values,weight,selection,needed) in self._histobindings.iteritems():
+                mask = None
+                if selection is not None:
+                    if not masks.has_key(selection):
+                        masks[selection] = self._selectionmask(selection,chunk,first,last)
+                    mask = masks[selection]
+                coords,w = _flattenfill(map(lambda v: _getcolumn(v,chunk),values),\
+                        _getcolumn(weight,chunk),mask)
+                hc.fill_array(hname,*coords,weights=w)
+            first = last
+
+    def getentries(self):
+        """The number of entries of the chain. It is evaluated the first
+        time is called, and only the files not present in the persistent
+        entry index (see `PyAnUtils.chainindex`) are opened
+        """
+        if self._nentries is None:
+            self._nentries = self._chainindex.getentries(self._tree)
         return self._nentries
 
     def getentry(self,i):
@@ -284,33 +1148,915 @@ class storedtree(object):
         """
         if self._currententry == i:
             return
-        _dummy = self._tree.GetEntry(i)
-        # working in xAOD trees, setting the aux variables each event
-        for varname in self._aux_associated.keys():
-            #setattr(self,varname,getattr(self._tree,varname))
-            #self._aux_associated[varname] = getattr(self._tree,varname+'Aux.')
-           getattr(self,varname).setStore(self._aux_associated[varname])
+        if self._learning:
+            if self._learning['remaining'] == 0:
+                self._stoplearning()
+            else:
+                self._learning['remaining'] -= 1
+        if self._profile:
+            self._profiledentry(i)
+        else:
+            _dummy = self._tree.GetEntry(i)
+        if self._readahead:
+            self._launchreadahead()
         self._currententry = i
+        for name,(friend,mapping) in self._friends.iteritems():
+            if mapping is None:
+                friend.getentry(i)
+            elif mapping[i] >= 0:
+                friend.getentry(int(mapping[i]))
+            self._friendmatch[name] = (mapping is None or mapping[i] >= 0)
 
-    #def fill_all_histos(self):
-    #    """
-    #    """
-    #    pass
+    def _container(self,aliasname):
+        """The activated container `aliasname`, binding its aux store (xAOD)
+        if it was not yet done for the current entry, i.e. only the
+        containers accessed are bound
+        """
+        if self._auxbranchnames.has_key(aliasname) and \
+                self._auxbound.get(aliasname) != self._currententry:
+            self._bindstore(aliasname)
+        return self._wise_values[aliasname][0]
 
-    #def fill(self,i):
-    #    """
-    #    """
-    #    self.getentry(i)
-    #    for histo,m in self._histos.iteritems():
-    #        x = m()
-    #        if len(m) >= 3:
-    #            x = variables[0],variables[1]
-    #            if len(variables) == 3:
-    #                z = variables[2]
-    #                histos.Fill(x,y,z)
-    #            else:
-    #                histos.Fill(x,y)
+    def _bindstore(self,aliasname):
+        """Bind the aux store of the activated xAOD container `aliasname`
+        for the current entry
+        """
+        if not self._aux_associated.has_key(aliasname):
+            self._aux_associated[aliasname] = getattr(self._tree,\
+                    self._auxbranchnames[aliasname])
+        self._wise_values[aliasname][0].setStore(self._aux_associated[aliasname])
+        self._auxbound[aliasname] = self._currententry
+
+    def profile(self,enable=True):
+        """Activate (or deactivate) the I/O instrumentation of the tree.
+        While active, `getentry` reads each active branch separately and
+        records per branch: the compressed bytes read (baskets), the bytes
+        decompressed, the number of baskets and the wall time spent in
+        ROOT.TBranch.GetEntry. The wall time spent in the Python side of the
+        method accessors (see `activate_variable`) is also recorded, as
+        well as the global ROOT.TTreePerfStats of the chain. See
+        `profile_report`
+
+        Parameters
+        ----------
+        enable: bool [Default: True]
+            whether to activate the instrumentation, the counters are reset
+            when activated
+
+        Examples
+        --------
+        >>> t.profile()
+        >>> for i in xrange(t.getentries()):
+        ...     t.getentry(i)
+        ...     # ...
+        >>> report = t.profile_report('ioprofile.json')
+        """
+        import ROOT
+
+        if self._profile:
+            # restore the original accessors
+            for accessor,(aliasname,methodname,original) in self._profile['wrapped'].iteritems():
+                self._wise_values[aliasname][1][methodname] = original
+                if self.__dict__.has_key(accessor):
+                    setattr(self,accessor,original)
+            # the chain points to the TTreePerfStats, detach it before the
+            # object is deleted
+            self._tree.SetPerfStats(0)
+            self._profile = None
+        if not enable:
+            return
+        self._profile = { 'branches': {}, 'accessors': {}, 'wrapped': {},
+                'lastbasket': {}, 'treenumber': -1,
+                'perfstats': ROOT.TTreePerfStats('ioperf',self._tree) }
+        for accessor,(aliasname,methodname,m,n,v) in self._methods.iteritems():
+            original = self._wise_values[aliasname][1][methodname]
+            timed = _timedaccessor(original,self._profile['accessors'].setdefault(\
+                    accessor,{ 'calls': 0, 'time': 0.0 }))
+            self._profile['wrapped'][accessor] = (aliasname,methodname,original)
+            self._wise_values[aliasname][1][methodname] = timed
+            if self.__dict__.has_key(accessor):
+                setattr(self,accessor,timed)
+        self._currententry = -1
+
+    def _profiledentry(self,i):
+        """Instrumented version of ROOT.TChain.GetEntry, reading the active
+        branches one by one (see `profile`)
+        """
+        import time
+
+        prof = self._profile
+        local = self._tree.LoadTree(i)
+        if local < 0:
+            return
+        tree = self._tree.GetTree()
+        newtree = (self._tree.GetTreeNumber() != prof['treenumber'])
+        if newtree:
+            prof['treenumber'] = self._tree.GetTreeNumber()
+            # the baskets of the split branches (xAOD Aux.) are in the
+            # sub-branches
+            prof['active'] = map(lambda br: (br,_leafbranches(br)),\
+                    filter(lambda br: self._tree.GetBranchStatus(br.GetName()),\
+                    tree.GetListOfBranches()))
+        for br,subbranches in prof['active']:
+            name = br.GetName()
+            stats = prof['branches'].setdefault(name,{ 'bytesread': 0,
+                'bytesunzipped': 0, 'baskets': 0, 'time': 0.0 })
+            t0 = time.time()
+            nbytes = br.GetEntry(local)
+            stats['time'] += time.time()-t0
+            stats['bytesunzipped'] += nbytes
+            for sub in subbranches:
+                basket = sub.GetReadBasket()
+                subname = sub.GetName()
+                if newtree or prof['lastbasket'].get(subname) != basket:
+                    prof['lastbasket'][subname] = basket
+                    stats['baskets'] += 1
+                    stats['bytesread'] += sub.GetBasketBytes()[basket]
+
+    def profile_report(self,jsonfile=None,show=True):
+        """The I/O report recorded since `profile` was activated
+
+        Parameters
+        ----------
+        jsonfile: str|None [Default: None]
+            if given, the report is also written to this JSON file
+        show: bool [Default: True]
+            whether to print the report as a table
+
+        Return
+        ------
+        dict: { 'branches': { name: { 'bytesread','bytesunzipped',
+                    'baskets','time' }, ... },
+                'accessors': { name: { 'calls', 'time' }, ... },
+                'total': { 'bytesread','readcalls','unziptime',
+                    'realtime','cputime' } }
+
+        Raises
+        ------
+        RuntimeError
+            if the instrumentation is not active
+        """
+        import json
+
+        if not self._profile:
+            raise RuntimeError("The I/O instrumentation is not active, see"\
+                    " the 'profile' method")
+        ps = self._profile['perfstats']
+        report = { 'branches': self._profile['branches'],
+                'accessors': self._profile['accessors'],
+                'total': { 'bytesread': ps.GetBytesRead(),
+                    'readcalls': ps.GetReadCalls(), 'unziptime': ps.GetUnzipTime(),
+                    'realtime': ps.GetRealTime(), 'cputime': ps.GetCpuTime() } }
+        if jsonfile:
+            with open(jsonfile,'w') as f:
+                json.dump(report,f,indent=1,sort_keys=True)
+        if show:
+            print "{0:<40} {1:>14} {2:>14} {3:>8} {4:>10}".format('branch','read [B]',\
+                    'unzipped [B]','baskets','time [s]')
+            for name,st in sorted(report['branches'].iteritems(),key=lambda (n,x): -x['time']):
+                print "{0:<40} {1:>14} {2:>14} {3:>8} {4:>10.4f}".format(name,\
+                        st['bytesread'],st['bytesunzipped'],st['baskets'],st['time'])
+            if report['accessors']:
+                print "{0:<40} {1:>14} {2:>10}".format('accessor','calls','time [s]')
+                for name,st in sorted(report['accessors'].iteritems(),key=lambda (n,x): -x['time']):
+                    print "{0:<40} {1:>14} {2:>10.4f}".format(name,st['calls'],st['time'])
+            print "Total: {0} bytes read in {1} calls, unzip time {2:.4f} s".format(\
+                    report['total']['bytesread'],report['total']['readcalls'],\
+                    report['total']['unziptime'])
+        return report
+
+    def _branchkind(self,bname):
+        """Classify a branch of the tree by its storage type
+
+        Parameters
+        ----------
+        bname: str
+            the name of the branch in the tree
+
+        Return
+        ------
+        str: 'scalar' for plain C types, 'vector' for std::vector or
+            variable length arrays and 'object' for any other class
+
+        Raises
+        ------
+        AttributeError
+            if the branch is not present in the tree
+        """
+        return self.getschema().getkind(bname)
+
+    def _resolvecolumn(self,name):
+        """Obtain how a column (an activated variable, its alias, an
+        activated method 'alias_method' or just a branch name) should be
+        read
+
+        Return
+        ------
+        (str,str|tuple): ('branch',branchname), ('method',methodinfo) or
+            ('friend',(friendname,column))
+        """
+        if self._methods.has_key(name):
+            return ('method',self._methods[name])
+        if name.find('.') != -1 and self._friends.has_key(name.split('.',1)[0]):
+            return ('friend',tuple(name.split('.',1)))
+        return ('branch',self._branchnames.get(name,name))
+
+    def _drawcolumns(self,expressions,start,stop,step,nrows):
+        """Evaluate up to 4 expressions over the entry range [start,stop)
+        using the ROOT.TTree.Draw machinery (no graphics) and copy the
+        internal buffers to NumPy arrays
+
+        Parameters
+        ----------
+        expressions: list(str)
+            the TTreeFormula expressions to be evaluated (4 at most)
+        start: int
+            first entry
+        stop: int
+            last entry (not included)
+        step: int
+            only one every `step` entries is used
+        nrows: int
+            upper limit of the number of rows to be obtained
+
+        Return
+        ------
+        list(numpy.ndarray)
+        """
+        import numpy as np
+
+        selection = ''
+        if step != 1:
+            selection = '(Entry$-{0})%{1}==0'.format(start,step)
+        first,nentries = start,stop-start
+        if self._selection is not None:
+            # with an entry list, ROOT counts the entries of the list
+            first = np.searchsorted(self._selection.entries,start)
+            nentries = np.searchsorted(self._selection.entries,stop)-first
+        self._tree.SetEstimate(nrows+1)
+        n = self._tree.Draw(':'.join(expressions),selection,'goff',int(nentries),int(first))
+        if n < 0:
+            raise RuntimeError("Invalid expression '{0}'".format(':'.join(expressions)))
+        arrays = []
+        for k in xrange(len(expressions)):
+            buf = self._tree.GetVal(k)
+            if n == 0 or not buf:
+                arrays.append(np.zeros(0,dtype=np.float64))
+                continue
+            buf.SetSize(n)
+            arrays.append(np.frombuffer(buf,dtype=np.float64,count=n).copy())
+        return arrays
+
+    def _readmethodcolumn(self,methodinfo,start,stop,step):
+        """Entry-by-entry evaluation of an activated method (see
+        `activate_variable`), used for classes which are not readable by
+        the TTreeFormula (xAOD containers). The vectorized methods fill a
+        single C++ buffer for the whole range (one call per entry)
+        """
+        import numpy as np
+        from PyAnUtils.jaggedarray import jaggedarray
+
+        aliasname,methodname,methodimpl,nocall,isvector = methodinfo
+        if self._vectorized.has_key(aliasname+'_'+methodname):
+            return self._readvectorizedcolumn(methodinfo,start,stop,step)
+        accessor = self._wise_values[aliasname][1][methodname]
+        counts = []
+        values = []
+        for i in self._entryrange(start,stop,step):
+            self.getentry(i)
+            if not isvector:
+                values.append(accessor())
+                continue
+            n = self._container(aliasname).size()
+            counts.append(n)
+            values.extend(map(accessor,xrange(n)))
+        values = np.array(values,dtype=np.float64)
+        if not isvector:
+            return values
+        return jaggedarray.fromcounts(values,counts)
+
+    def _readvectorizedcolumn(self,methodinfo,start,stop,step):
+        """Evaluate a vectorized method (see `activate_variable`) over an
+        entry range: the loop over the entries is a compiled C++ function
+        (see `_getvectorizedrange`) appending the values of all the entries
+        to the same C++ buffer
+
+        Return
+        ------
+        jaggedarray
+        """
+        import ROOT
+        import numpy as np
+        from array import array
+        from PyAnUtils.jaggedarray import jaggedarray
+
+        aliasname,methodname,methodimpl,nocall,isvector = methodinfo
+        bname = self._branchnames[aliasname]
+        auxname = self._auxbranchnames.get(aliasname,'')
+        auxclassname = None
+        if auxname:
+            auxclassname = self.getschema().getclassname(auxname)
+        rangefunc = _getvectorizedrange(self.getschema().getclassname(bname),\
+                methodimpl,nocall,auxclassname)
+        entries = array('l',self._entryrange(start,stop,step).astype(np.int_).tostring())
+        counts = array('l',[0])*len(entries)
+        out = ROOT.std.vector('double')()
+        _dummy = rangefunc(self._tree,bname,auxname,entries,len(entries),out,counts)
+        # the chain was moved, the next getentry must re-load its entry
+        self._currententry = -1
+        return jaggedarray.fromcounts(_vectortonumpy(out),\
+                np.frombuffer(counts,dtype=np.int_).astype(np.int64))
+
+    def read_columns(self,branches=None,start=0,stop=None,step=1):
+        """Read a whole entry range of the tree in one call, returning
+        NumPy arrays instead of accessing entry by entry. The scalar
+        branches are returned as flat arrays (one element per entry) while
+        the std::vector (and variable length arrays) are returned as
+        `PyAnUtils.jaggedarray.jaggedarray` (content and offsets buffers).
+
+        Parameters
+        ----------
+        branches: list(str)|str|None
+            the columns to read. They can be branch names, the aliases used
+            in `activate_variable`, the method accessors 'varname_method' or
+            the columns of a friend tree 'friendname.column' (see `add_friend`).
+            If None, all the activated methods and the activated variables
+            readable as numbers (not the classes, nor the containers only
+            used through their methods) are used
+        start: int [Default: 0]
+            first entry
+        stop: int|None [Default: None]
+            last entry (not included), if None the entries of the tree
+        step: int [Default: 1]
+            read one every `step` entries
+
+        Return
+        ------
+        dict(str,numpy.ndarray|jaggedarray)
+            the columns keyed by the name used in `branches`
+
+        Raises
+        ------
+        AttributeError
+            if any of the branches is not present in the tree
+        TypeError
+            if a branch is a class not readable as numbers (use
+            `activate_variable` with `methodtouse` instead)
+
+        Examples
+        --------
+        >>> t = plaintree('file.root','KsTree')
+        >>> cols = t.read_columns(['decayLength','trk_eta'],0,100000)
+        >>> ntracks = cols['trk_eta'].counts()
+        """
+        import numpy as np
+        from PyAnUtils.jaggedarray import jaggedarray
+
+        if branches is None:
+            branches = filter(lambda alias: len(self._wise_values[alias][1]) == 0 and \
+                    self._branchkind(self._branchnames[alias]) != 'object',\
+                    self._wise_values.keys())+self._methods.keys()
+        elif type(branches) is str:
+            branches = [branches]
+        if stop is None or stop > self.getentries():
+            stop = self.getentries()
+        nrows = max(0,(stop-start+step-1)//step)
+
+        columns = {}
+        scalars = []
+        for name in branches:
+            kind,what = self._resolvecolumn(name)
+            if kind == 'friend':
+                columns[name] = self._readfriendcolumn(what[0],what[1],start,stop,step)
+                continue
+            elif kind == 'method':
+                columns[name] = self._readmethodcolumn(what,start,stop,step)
+                continue
+            btype = self._branchkind(what)
+            if btype == 'object':
+                raise TypeError("Branch '{0}' is a class, use 'activate_variable'"\
+                        " with a method to read it".format(what))
+            elif btype == 'scalar':
+                scalars.append( (name,what) )
+            else:
+                counts = self._drawcolumns(['Length$({0})'.format(what)],\
+                        start,stop,step,nrows)[0].astype(np.int64)
+                values = self._drawcolumns([what],start,stop,step,int(counts.sum()))[0]
+                columns[name] = jaggedarray.fromcounts(values,counts)
+        # the scalars are evaluated in groups of 4 per tree pass
+        for k in xrange(0,len(scalars),4):
+            group = scalars[k:k+4]
+            arrays = self._drawcolumns(map(lambda (n,b): b,group),start,stop,step,nrows)
+            for (name,bname),arr in zip(group,arrays):
+                columns[name] = arr
+        return columns
+
+    def iterate(self,chunk_size=100000,branches=None,start=0,stop=None):
+        """Generator over the tree in columnar chunks of `chunk_size`
+        entries (see `read_columns`). Only one chunk is kept in memory
+        at a time (the TTree::Draw buffers are also sized to the chunk),
+        so the memory is bounded whatever the size of the chain.
+
+        Parameters
+        ----------
+        chunk_size: int [Default: 100000]
+            number of entries per chunk (the last one could be smaller)
+        branches: list(str)|str|None
+            the columns to read, see `read_columns`
+        start: int [Default: 0]
+            first entry
+        stop: int|None [Default: None]
+            last entry (not included), if None the entries of the tree
+
+        Yields
+        ------
+        dict(str,numpy.ndarray|jaggedarray)
+            the columns of the chunk, see `read_columns`
+
+        Raises
+        ------
+        ValueError
+            if `chunk_size` is not a positive number
+
+        Examples
+        --------
+        >>> for chunk in t.iterate(50000,['decayLength','mass']):
+        ...     counts += np.histogram(chunk['mass'][chunk['decayLength'] > 4.],edges)[0]
+        """
+        if chunk_size < 1:
+            raise ValueError("Invalid chunk_size '{0}'".format(chunk_size))
+        if stop is None or stop > self.getentries():
+            stop = self.getentries()
+        for first in xrange(start,stop,chunk_size):
+            yield self.read_columns(branches,first,min(first+chunk_size,stop))
+
+    def _selectionmask(self,selection,chunk,start,stop):
+        """Evaluate a selection over a chunk of entries [start,stop)
+
+        Parameters
+        ----------
+        selection: str|callable
+            a TTreeFormula expression (evaluated by ROOT) or a function
+            of the chunk returning a boolean numpy.ndarray
+        chunk: dict(str,numpy.ndarray|jaggedarray)
+            the columns of the chunk (see `read_columns`)
+
+        Return
+        ------
+        numpy.ndarray(bool)
+        """
+        if callable(selection):
+            return selection(chunk)
+        return self._drawcolumns(['({0})!=0'.format(selection)],start,stop,1,\
+                stop-start)[0].astype(bool)
+
+    def to_column_cache(self,path,branches=None,selection=None,chunk_size=100000):
+        """Export columns of the tree to a memory-mappable column cache,
+        which can be read back without ROOT (and without decompression)
+        with `PyAnUtils.columncache.columncache`
+
+        Parameters
+        ----------
+        path: str
+            the directory of the cache
+        branches: list(str)|str|None
+            the columns to export, see `read_columns`
+        selection: str|callable|None [Default: None]
+            only the entries passing the selection are exported, a
+            TTreeFormula expression or a function of the chunk returning a
+            boolean numpy.ndarray
+        chunk_size: int [Default: 100000]
+            entries read at once
+
+        Return
+        ------
+        PyAnUtils.columncache.columncache: the cache just written
 
+        Examples
+        --------
+        >>> t.to_column_cache('/scratch/ks',['mass','decayLength','trk_eta'],\
+        ...         'fabs(pseudorapidity) < 1.0')
+        >>> c = columncache('/scratch/ks')
+        >>> c['mass']
+        """
+        from PyAnUtils.columncache import columncachewriter,columncache
+
+        if selection is None or type(selection) is str:
+            description = selection
+        else:
+            description = repr(selection)
+        metadata = { 'treename': self._tree.GetName(),
+                'rootfiles': sorted(self._rootfiles),
+                'selection': description }
+        writer = columncachewriter(path,metadata)
+        stop = self.getentries()
+        first = 0
+        for chunk in self.iterate(chunk_size,branches,0,stop):
+            # the entry range, not the rows (fewer with an active selection)
+            last = min(first+chunk_size,stop)
+            if selection is not None:
+                mask = self._selectionmask(selection,chunk,first,last)
+                chunk = dict(map(lambda (name,col): (name,col[mask]),chunk.iteritems()))
+            writer.append(chunk)
+            first = last
+        writer.close()
+        return columncache(path)
+
+    def add_friend(self,friend,key=('runNumber','eventNumber'),name=None,\
+            treename=None,aligned=None):
+        """Join a friend tree (i.e. a tree derived from this one: weights,
+        decorations, ...) to this tree. The entries of both trees are
+        matched by the values of the `key` columns, using a sorted index of
+        the friend which is built once and stored in the cache directory of
+        the package. If both trees have the same number of entries they are
+        assumed to be aligned row by row and no index is used.
+
+        After the join, `getentry` loads also the matching entry of the
+        friend, which is accessible through the attribute `name`, and its
+        columns can be read with `read_columns` as 'name.column'. The
+        entries without match in the friend must be checked with
+        `friendmatched` (the friend keeps the values of its last entry)
+
+        Parameters
+        ----------
+        friend: storedtree|str|list(str)
+            the friend tree, or its files (then `treename` is needed)
+        key: tuple(str) [Default: ('runNumber','eventNumber')]
+            the columns identifying the entries in both trees
+        name: str|None [Default: None]
+            the name of the friend, if None the name of its tree
+        treename: str|None [Default: None]
+            the name of the tree when `friend` are files
+        aligned: bool|None [Default: None]
+            force (True) or disable (False) the positional alignment, if
+            None it is used when the number of entries are equal
+
+        Raises
+        ------
+        RuntimeError
+            if `friend` are files but not `treename` was given
+        KeyError
+            if a friend with the same name was already added
+
+        Examples
+        --------
+        >>> t = plaintree(files,'KsTree_KsSampleCreator')
+        >>> t.add_friend(weightfiles,treename='weight_tree',name='w')
+        >>> cols = t.read_columns(['mass','w.weights'])
+        """
+        if not isinstance(friend,storedtree):
+            if not treename:
+                raise RuntimeError("The 'treename' argument is needed to"\
+                        " add a friend from files")
+            friend = plaintree(friend,treename)
+        if name is None:
+            name = friend._tree.GetName()
+        if self._friends.has_key(name):
+            raise KeyError("Friend '{0}' already added".format(name))
+        if aligned is None:
+            aligned = (friend.getentries() == self.getentries())
+        mapping = None
+        if not aligned:
+            mapping = self._friendmapping(friend,key)
+        self._friends[name] = (friend,mapping)
+        setattr(self,name,friend)
+
+    def friendmatched(self,name):
+        """Whether the current entry (see `getentry`) has a matching entry
+        in the friend `name`, otherwise the values of the friend are not
+        valid for this entry
+
+        Raises
+        ------
+        KeyError
+            if the friend was not added
+
+        Examples
+        --------
+        >>> t.getentry(i)
+        >>> if t.friendmatched('w'):
+        ...     weight = t.w.weights
+        """
+        if not self._friends.has_key(name):
+            raise KeyError("Friend '{0}' not added".format(name))
+        return self._friendmatch.get(name,False)
+
+    def _friendmapping(self,friend,key):
+        """Map each entry of this tree to the entry of the `friend` with the
+        same `key` values (-1 if not present)
+
+        Return
+        ------
+        numpy.ndarray(int)
+        """
+        import os
+        import hashlib
+        import numpy as np
+        from PyAnUtils.pyanfunctions import getcachedir,filesignature
+
+        key = tuple(key)
+        names = map(lambda k: 'k{0}'.format(k),xrange(len(key)))
+        # the sorted index of the friend, persistent
+        signature = repr( (friend._tree.GetName(),key,\
+                map(filesignature,sorted(friend._rootfiles))) )
+        indexfile = os.path.join(getcachedir('friendindex'),\
+                hashlib.sha1(signature).hexdigest()+'.npz')
+        try:
+            stored = np.load(indexfile)
+            sortedkeys,entries = stored['keys'],stored['entries']
+        except IOError:
+            cols = friend.read_columns(list(key))
+            keys = np.core.records.fromarrays(map(lambda k: cols[k],key),names=names)
+            entries = np.argsort(keys,order=names)
+            sortedkeys = keys[entries]
+            with open(indexfile+'.{0}.tmp'.format(os.getpid()),'wb') as f:
+                np.savez(f,keys=sortedkeys,entries=entries)
+            os.rename(indexfile+'.{0}.tmp'.format(os.getpid()),indexfile)
+        # the mapping is built for all the entries
+        selection = self._selection
+        self._setselection(None)
+        cols = self.read_columns(list(key))
+        self._setselection(selection)
+        keys = np.core.records.fromarrays(map(lambda k: cols[k],key),names=names)
+        pos  = np.searchsorted(sortedkeys,keys)
+        found = pos < len(sortedkeys)
+        found[found] = (sortedkeys[pos[found]] == keys[found])
+        mapping = -np.ones(len(keys),dtype=np.int64)
+        mapping[found] = entries[pos[found]]
+        return mapping
+
+    def _readfriendcolumn(self,name,column,start,stop,step):
+        """Read a column of a friend tree aligned with the entries of this
+        one (see `add_friend`). The entries without match are NaN (scalars)
+        or empty (jagged)
+        """
+        import numpy as np
+        from PyAnUtils.jaggedarray import jaggedarray
+
+        friend,mapping = self._friends[name]
+        if mapping is None and self._selection is None:
+            return friend.read_columns([column],start,stop,step)[column]
+        m = self._entryrange(start,stop,step)
+        if mapping is not None:
+            m = mapping[m]
+        valid = m >= 0
+        if not valid.any():
+            lo,hi = 0,0
+        else:
+            lo,hi = m[valid].min(),m[valid].max()+1
+        col = friend.read_columns([column],lo,hi)[column]
+        # the entries without match point to an extra empty entry
+        index = np.where(valid,m-lo,hi-lo)
+        if isinstance(col,jaggedarray):
+            col = jaggedarray.fromcounts(col.content,np.append(col.counts(),0))
+        else:
+            col = np.append(col.astype(np.float64),np.nan)
+        return col[index]
+
+    def _entryrange(self,start,stop,step):
+        """The entries in [start,stop) (one every `step`) which pass the
+        active selection (see `select`)
+
+        Return
+        ------
+        numpy.ndarray(int)
+        """
+        import numpy as np
+
+        if self._selection is None:
+            return np.arange(start,stop,step,dtype=np.int64)
+        entries = self._selection.entries
+        entries = entries[np.searchsorted(entries,start):np.searchsorted(entries,stop)]
+        if step != 1:
+            entries = entries[(entries-start)%step == 0]
+        return entries
+
+    def _setselection(self,selection):
+        """Activate a selection (or remove it if None) in the chain, all the
+        ROOT.TTree.Draw/Project calls and the columnar reads only use the
+        entries of the selection
+        """
+        self._selection = selection
+        if selection is None:
+            self._tree.SetEntryList(0)
+        else:
+            self._tree.SetEntryList(selection.getentrylist(self._tree))
+
+    def select(self,expr,apply=True):
+        """Evaluate the selection `expr` over the tree and keep the entries
+        passing it. The result of each file is stored as a compressed
+        bitmap in the cache directory of the package, keyed by the file
+        signature and the expression, so it is only evaluated once. If a
+        selection is already active, both are combined (the bitmaps of
+        `expr` alone are cached, so they are re-used whatever the previous
+        selection is).
+
+        Parameters
+        ----------
+        expr: str|None
+            a TTreeFormula expression, if None the active selection is
+            removed
+        apply: bool [Default: True]
+            whether the selection is activated, i.e. the loops over the
+            selection, ROOT.TTree.Project calls and `read_columns` only use
+            the selected entries
+
+        Return
+        ------
+        entryselection|None
+
+        Examples
+        --------
+        >>> sel = t.select('decayLength > 4 && decayLength < 10 && fabs(eta) < 1')
+        >>> cols = t.read_columns(['mass'])   # only the selected entries
+        >>> for i in sel:
+        ...     t.getentry(i)
+        """
+        import numpy as np
+
+        if expr is None:
+            self._setselection(None)
+            return None
+        active = self._selection
+        fullexpr = expr
+        if active is not None:
+            fullexpr = '({0}) && ({1})'.format(active.expr,expr)
+        _dummy = self.getentries()
+        # the bitmaps of `expr` alone over all the entries, the active
+        # selection (which could depend on the whole chain, see sample) is
+        # combined in memory
+        self._setselection(None)
+        try:
+            masks = []
+            for fname,offset,nentries in self._chainindex.getfileentries():
+                masks.append( self._fileselection(fname,offset,nentries,expr) )
+        finally:
+            self._setselection(active)
+        mask = np.concatenate(masks) if masks else np.zeros(0,dtype=bool)
+        if active is not None:
+            previous = np.zeros(len(mask),dtype=bool)
+            previous[active.entries[active.entries < len(mask)]] = True
+            mask &= previous
+        selection = entryselection(fullexpr,np.nonzero(mask)[0].astype(np.int64))
+        if apply:
+            self._setselection(selection)
+        return selection
+
+    def _fileselection(self,fname,offset,nentries,expr):
+        """The boolean mask of the entries of a file of the chain passing
+        `expr`, obtained from the persistent bitmap cache or evaluated
+        (and stored). The remote files are not cached
+
+        Return
+        ------
+        numpy.ndarray(bool)
+        """
+        import os
+        import hashlib
+        import numpy as np
+        from PyAnUtils.pyanfunctions import getcachedir,filesignature
+
+        bitmapfile = None
+        if fname.find('://') == -1:
+            key = repr( (filesignature(fname),self._tree.GetName(),expr) )
+            bitmapfile = os.path.join(getcachedir('selections'),\
+                    hashlib.sha1(key).hexdigest()+'.npz')
+            try:
+                stored = np.load(bitmapfile)
+                return np.unpackbits(stored['bits'])[:nentries].astype(bool)
+            except IOError:
+                pass
+        mask = np.zeros(nentries,dtype=bool)
+        entries,passed = self._drawcolumns(['Entry$','({0})!=0'.format(expr)],\
+                offset,offset+nentries,1,nentries)
+        mask[entries.astype(np.int64)-offset] = passed.astype(bool)
+        if bitmapfile is None:
+            return mask
+        tmpname = '{0}.{1}.tmp'.format(bitmapfile,os.getpid())
+        with open(tmpname,'wb') as f:
+            np.savez_compressed(f,bits=np.packbits(mask))
+        os.rename(tmpname,bitmapfile)
+        return mask
+
+    def sample(self,fraction=None,n=None,seed=0,apply=True):
+        """Select a random, reproducible subset of the entries made of whole
+        ROOT basket clusters (see `getclusters`) picked uniformly over all
+        the files of the chain: the subset is representative of the whole
+        dataset but only contiguous baskets are read. The subset is used as
+        a selection (see `select`), combined with the active one if any.
+
+        Parameters
+        ----------
+        fraction: float|None
+            the fraction (0,1] of entries to sample
+        n: int|None
+            the (approximate) number of entries to sample, used if no
+            `fraction` is given
+        seed: int [Default: 0]
+            the seed of the random generator, the same seed gives the same
+            subset
+        apply: bool [Default: True]
+            whether the subset is activated as selection
+
+        Return
+        ------
+        entryselection
+
+        Raises
+        ------
+        ValueError
+            if neither `fraction` nor `n` are given, or out of range
+
+        Examples
+        --------
+        >>> t.sample(0.01,seed=42)
+        >>> cols = t.read_columns(['pt','eta'])   # ~1% of the entries
+        """
+        import numpy as np
+
+        if fraction is not None:
+            if not 0.0 < fraction <= 1.0:
+                raise ValueError("Invalid fraction '{0}'".format(fraction))
+            target = int(round(fraction*self.getentries()))
+        elif n is not None:
+            if n < 1:
+                raise ValueError("Invalid number of entries '{0}'".format(n))
+            target = min(n,self.getentries())
+        else:
+            raise ValueError("Either 'fraction' or 'n' must be given")
+        clusters = self.getclusters()
+        order = np.random.RandomState(seed).permutation(len(clusters))
+        sizes = np.array(map(lambda (first,last): last-first,clusters),dtype=np.int64)[order]
+        # the minimum number of clusters to reach the target
+        nchosen = min(len(clusters),np.searchsorted(np.cumsum(sizes),target)+1)
+        chosen = sorted(order[:nchosen])
+        entries = np.concatenate(map(lambda k: np.arange(clusters[k][0],clusters[k][1],\
+                dtype=np.int64),chosen)) if nchosen else np.zeros(0,dtype=np.int64)
+        expr = 'sample({0},{1})'.format(fraction if fraction is not None else n,seed)
+        if self._selection is not None:
+            entries = np.intersect1d(self._selection.entries,entries)
+            expr = '({0}) && {1}'.format(self._selection.expr,expr)
+        selection = entryselection(expr,entries)
+        if apply:
+            self._setselection(selection)
+        return selection
+
+    def skim(self,outdir,branches=None,selection=None,nworkers=None):
+        """Write a reduced copy of the chain, one output file per input
+        file (processed in a pool of processes), keeping only `branches`
+        and the entries passing `selection`. If there is no selection the
+        baskets are copied without decompression (ROOT fast cloning). The
+        compression settings of the input files are kept.
+
+        Parameters
+        ----------
+        outdir: str
+            the output directory (created if needed)
+        branches: list(str)|None [Default: None]
+            the branches (or activated aliases) to keep, if None all
+        selection: str|None [Default: None]
+            a TTreeFormula expression, only the entries passing it are kept
+        nworkers: int|None [Default: None]
+            number of processes, if None the number of cpus
+
+        Return
+        ------
+        plaintree: the reduced chain
+
+        Examples
+        --------
+        >>> small = t.skim('/scratch/skim',['mass','decayLength','pseudorapidity'],\
+        ...         'decayLength > 4')
+        """
+        import os
+        import multiprocessing
+
+        if nworkers is None:
+            nworkers = multiprocessing.cpu_count()
+        try:
+            os.makedirs(outdir)
+        except OSError:
+            if not os.path.isdir(outdir):
+                raise IOError("Not possible to create the directory '{0}'".format(outdir))
+        if branches is not None:
+            branches = sorted(self._usedbranches(branches))
+        treename = self._tree.GetName()
+        tasks = []
+        basenames = set()
+        for k,fname in enumerate(sorted(self._rootfiles)):
+            basename = os.path.basename(fname)
+            if basename in basenames:
+                basename = '{0}_{1}'.format(k,basename)
+            basenames.add(basename)
+            tasks.append( (fname,os.path.join(outdir,basename),treename,branches,selection) )
+        if nworkers == 1 or len(tasks) <= 1:
+            outfiles = map(_skimfile,tasks)
+        else:
+            pool = multiprocessing.Pool(min(nworkers,len(tasks)))
+            outfiles = pool.map(_skimfile,tasks,chunksize=1)
+            pool.close()
+            pool.join()
+        return plaintree(outfiles,treename)
 
 class plaintree(storedtree):
     """.. class plaintree(rootfiles,treename)
@@ -327,6 +2073,7 @@ class plaintree(storedtree):
         import ROOT
 
         super(plaintree,self).__init__(rootfiles,treename)
+        self._ctorargs = (treename,)
         
         # create direct access to the variables (as attributes of the class)
         self.getentry(0)
@@ -381,36 +2128,15 @@ class xaodtree(storedtree):
         # Initialize the tree, just to be able to set memory addresses
         self.getentry(0)
 
-        # Obtain all the variables of the tree, and their associated
-        branch_names = map(lambda x: x.GetName(), self._tree.GetListOfBranches())
-        tocreate_attr = []
-        for bname in filter(lambda y: y.find('Aux') == -1,branch_names):
-            try:
-                # try to match then name or only the instance name A_B_C --> C
-                bname_aux = filter(lambda x: x == bname+'Aux.',branch_names)[0]
-                self._aux_associated[bname] = getattr(self._tree,bname_aux)
-            except IndexError:
-                pass
-            tocreate_attr.append( (bname,getattr(self._tree,bname)) )
-        # -- note that if no aux is associated is because we are not using 
-        #    properly the name info: CONTAINERTYPE<CLASSCONTAINED>_INSTANCENAME_
-        if len(self._aux_associated) == 0:
-            tocreate_attr = []
-            # get a splitted list TYPECLASS,INSTANCE
-            instances_names = map(lambda x: x.GetName().split('_'), self._tree.GetListOfBranches())
-            for bname in filter(lambda y: y[-1].find('Aux') == -1,instances_names):
-                try:
-                    # try to match then name or only the instance name A_B_C --> C
-                    bname_aux = filter(lambda x: x[-1] == bname[-1]+'Aux.',instances_names)[0]
-                    self._aux_associated[bname[-1]] = getattr(self._tree,'_'.join(bname_aux))
-                except IndexError:
-                    pass
-                tocreate_attr.append( (bname[-1],getattr(self._tree,'_'.join(bname))) )
-        # create the attribute to the class
-        for (atname,obj) in tocreate_attr:
-            setattr(self,atname,obj)
-        #    properly the instances names: TYPE_CLASS_INSTANCE 
-        # do the association (points to the aux var)
-        for varname,auxvar in self._aux_associated.iteritems():
-            getattr(self,varname).setStore(auxvar)
+        # Obtain all the variables of the tree, and their associated Aux.
+        # (from the schema, see PyAnUtils.treeschema.getauxpairs).
+        # The containers are resolved (and its aux store bound) lazily, the
+        # first time they are accessed, see __getattr__
+        containers,auxpairs = self.getschema().getauxpairs()
+        self._branchnames.update(containers)
+        self._auxpairs.update(auxpairs)
+        for atname,bname in self._branchnames.iteritems():
+            self._lazyattrs[atname] = bname
+            if self._auxpairs.has_key(bname):
+                self._auxbranchnames[atname] = self._auxpairs[bname]
 
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+""":module:`treeschema` -- Persistent schema of the trees
+=========================================================
+
+.. module:: treeschema
+      :platform: Unix
+      :synopsis: Keep on disk the list of branches of a tree (names, class
+                 and type names, split levels and xAOD aux pairings), so
+                 the structure of a tree is known without opening the file.
+
+       .. scriptauthor:: Jordi Duarte-Campderros <jorge.duarte.campderros@cern.ch>
+"""
+
+# in-process schemas: (treename,signature) --> treeschema
+_SCHEMAS = {}
+
+class treeschema(object):
+    """Structure of a tree stored in a file: the top-level branches in
+    the order of the tree, with their class name (empty for plain C
+    types), the type of their first leaf, their split level and whether
+    they are arrays; and the pairing of the xAOD containers with their
+    auxiliary store ('Aux.' branches).
+    The schema is built once per file and stored in the cache directory
+    of the package (see `PyAnUtils.pyanfunctions.getcachedir`), keyed by
+    the signature of the file (see `PyAnUtils.pyanfunctions.filesignature`),
+    therefore any modification of the file invalidates it. Remote files
+    (URLs as root://...) are never cached
+
+    Example
+    -------
+    >>> s = treeschema('RPVMCInfoTree','f1.root')
+    >>> triggers = filter(lambda x: x.find('HLT') == 0, s.branchnames())
+    >>> s.getclassname('dv_X')
+    'vector<float>'
+    """
+    def __init__(self,treename,rootfile):
+        """Load the schema of the tree `treename` stored in `rootfile`,
+        the file is only opened if the schema is not in the cache
+
+        Parameters
+        ----------
+        treename: str
+            the name of the tree
+        rootfile: str
+            the file containing the tree
+
+        Raises
+        ------
+        IOError
+            if the file does not exist, or it does not contain the tree
+        """
+        import os
+        import hashlib
+        from PyAnUtils.pyanfunctions import getcachedir,filesignature,loadcache,storecache
+
+        self._treename = treename
+        self._rootfile = rootfile
+        if rootfile.find('://') == -1:
+            signature = filesignature(rootfile)
+            cachefile = os.path.join(getcachedir('schema'),\
+                    hashlib.md5(repr((treename,signature))).hexdigest()+'.pkl')
+            schema = loadcache(cachefile)
+            if schema is None:
+                schema = self._build()
+                storecache(cachefile,schema)
+        else:
+            schema = self._build()
+        self._guid     = schema['guid']
+        self._branches = schema['branches']
+        self._auxpairs = schema['auxpairs']
+        self._index    = dict(map(lambda (k,br): (br[0],k),enumerate(self._branches)))
+
+    def _build(self):
+        """Open the file and extract the schema of the tree
+
+        Return
+        ------
+        dict: { 'guid': str, 'branches': [ (name,classname,typename,
+                splitlevel,isarray), ... ], 'auxpairs': { branch: aux, ... } }
+        """
+        import ROOT
+
+        f = ROOT.TFile.Open(self._rootfile)
+        if not f or f.IsZombie():
+            raise IOError("File '{0}' does not exists!".format(self._rootfile))
+        tree = f.Get(self._treename)
+        if not tree:
+            f.Close()
+            raise IOError("Tree '{0}' not present in '{1}'".format(self._treename,\
+                    self._rootfile))
+        branches = []
+        for br in tree.GetListOfBranches():
+            leaves = br.GetListOfLeaves()
+            typename = ''
+            isarray  = False
+            if leaves.GetEntries() > 0:
+                leaf = leaves[0]
+                typename = leaf.GetTypeName()
+                isarray  = bool(leaf.GetLeafCount()) or leaf.GetLen() > 1
+            branches.append( (br.GetName(),br.GetClassName(),typename,\
+                    br.GetSplitLevel(),isarray) )
+        guid = f.GetUUID().AsString()
+        f.Close()
+        return { 'guid': guid, 'branches': branches,
+                'auxpairs': getauxpairs(map(lambda x: x[0],branches)) }
+
+    def getguid(self):
+        """The GUID of the file the schema was extracted from
+        """
+        return self._guid
+
+    def branchnames(self):
+        """The names of the top-level branches, in the order of the tree
+
+        Return
+        ------
+        list(str)
+        """
+        return map(lambda br: br[0],self._branches)
+
+    def has_branch(self,bname):
+        """Whether the tree has the top-level branch `bname`
+        """
+        return self._index.has_key(bname)
+
+    def _get(self,bname,k):
+        try:
+            return self._branches[self._index[bname]][k]
+        except KeyError:
+            raise AttributeError("Branch '{0}' not present in the tree".format(bname))
+
+    def getclassname(self,bname):
+        """The class name of the branch, empty for plain C types
+        (ROOT.TBranch.GetClassName)
+
+        Raises
+        ------
+        AttributeError
+            if the branch is not present in the tree
+        """
+        return self._get(bname,1)
+
+    def gettypename(self,bname):
+        """The type name of the first leaf of the branch
+        (ROOT.TLeaf.GetTypeName)
+
+        Raises
+        ------
+        AttributeError
+            if the branch is not present in the tree
+        """
+        return self._get(bname,2)
+
+    def getsplitlevel(self,bname):
+        """The split level of the branch
+
+        Raises
+        ------
+        AttributeError
+            if the branch is not present in the tree
+        """
+        return self._get(bname,3)
+
+    def getkind(self,bname):
+        """Classify a branch by its storage type
+
+        Return
+        ------
+        str: 'scalar' for plain C types, 'vector' for std::vector or
+            variable length arrays and 'object' for any other class
+
+        Raises
+        ------
+        AttributeError
+            if the branch is not present in the tree
+        """
+        classname = self.getclassname(bname)
+        if classname.find('vector<') == 0:
+            return 'vector'
+        elif classname:
+            return 'object'
+        elif self._get(bname,4):
+            return 'vector'
+        return 'scalar'
+
+    def getauxpairs(self):
+        """The xAOD containers and their auxiliary store, see `getauxpairs`
+
+        Return
+        ------
+        (dict(str,str),dict(str,str)): the containers { attribute: branch },
+            and their aux branches { branch: auxbranch }
+        """
+        return self._auxpairs
+
+def getauxpairs(branch_names):
+    """Pair the xAOD containers with their auxiliary store branches
+    ('Aux.'). The name of the attribute of the container is the branch
+    name, unless the branches do not follow the naming convention
+    CONTAINERTYPE<CLASSCONTAINED>_INSTANCENAME_, in that case the
+    instance name is used
+
+    Parameters
+    ----------
+    branch_names: list(str)
+
+    Return
+    ------
+    (dict(str,str),dict(str,str)): the containers { attribute: branch },
+        and their aux branches { branch: auxbranch }
+    """
+    containers = {}
+    auxpairs   = {}
+    branchset  = set(branch_names)
+    for bname in filter(lambda y: y.find('Aux') == -1,branch_names):
+        containers[bname] = bname
+        if bname+'Aux.' in branchset:
+            auxpairs[bname] = bname+'Aux.'
+    # -- note that if no aux is associated is because we are not using
+    #    properly the name info: CONTAINERTYPE<CLASSCONTAINED>_INSTANCENAME_
+    if len(auxpairs) == 0:
+        containers = {}
+        # try to match the instance name only A_B_C --> C
+        instances = dict(map(lambda x: (x.split('_')[-1],x),branch_names))
+        for instname,bname in instances.iteritems():
+            if instname.find('Aux') != -1:
+                continue
+            containers[instname] = bname
+            if instances.has_key(instname+'Aux.'):
+                auxpairs[bname] = instances[instname+'Aux.']
+    return (containers,auxpairs)
+
+def getschema(treename,rootfiles):
+    """The schema of a chain, i.e. the schema of its first file (as
+    ROOT.TChain does, all the files are assumed to share the structure).
+    The schemas are kept in memory as well, so repeated calls are free
+
+    Parameters
+    ----------
+    treename: str
+        the name of the tree
+    rootfiles: str|list(str)
+        the files of the chain (used sorted, as in
+        `PyAnUtils.chainindex.chainindex`)
+
+    Return
+    ------
+    treeschema
+    """
+    from PyAnUtils.pyanfunctions import filesignature
+
+    if type(rootfiles) is str:
+        rootfiles = [rootfiles]
+    rootfile = sorted(rootfiles)[0]
+    if rootfile.find('://') == -1:
+        key = (treename,filesignature(rootfile))
+    else:
+        key = (treename,rootfile)
+    if not _SCHEMAS.has_key(key):
+        _SCHEMAS[key] = treeschema(treename,rootfile)
+    return _SCHEMAS[key]
+
+def fromtree(tree):
+    """The schema of an already opened tree or chain, see `getschema`
+
+    Parameters
+    ----------
+    tree: ROOT.TTree|ROOT.TChain
+
+    Return
+    ------
+    treeschema
+    """
+    if tree.InheritsFrom('TChain'):
+        rootfiles = map(lambda el: el.GetTitle(),tree.GetListOfFiles())
+    else:
+        rootfiles = [tree.GetCurrentFile().GetName()]
+    return getschema(tree.GetName(),rootfiles)
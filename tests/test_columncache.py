@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Tests of `PyAnUtils.columncache` (ROOT not needed)
+"""
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from PyAnUtils.columncache import columncachewriter,columncache
+from PyAnUtils.jaggedarray import jaggedarray
+
+class columncachetest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        r = np.random.RandomState(3)
+        self.chunks = []
+        for n in [5,0,7]:
+            counts = r.randint(0,4,n)
+            self.chunks.append( { 'mass': r.normal(0.5,0.01,n).astype(np.float32),
+                'trk_eta': jaggedarray.fromcounts(r.normal(0,1,counts.sum()),counts) } )
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def write(self):
+        w = columncachewriter(self.path,{'treename': 'KsTree'})
+        for chunk in self.chunks:
+            w.append(chunk)
+        w.close()
+        return columncache(self.path)
+
+    def test_multichunk_roundtrip(self):
+        c = self.write()
+        self.assertEqual(sorted(c.keys()),['mass','trk_eta'])
+        self.assertEqual(c.getentries(),12)
+        self.assertEqual(c.metadata['treename'],'KsTree')
+        mass = np.concatenate(map(lambda ch: ch['mass'],self.chunks))
+        self.assertEqual(c['mass'].dtype,np.float32)
+        self.assertTrue(np.array_equal(c['mass'],mass))
+        eta = jaggedarray.concatenate(map(lambda ch: ch['trk_eta'],self.chunks))
+        self.assertTrue(np.array_equal(c['trk_eta'].offsets,eta.offsets))
+        self.assertTrue(np.array_equal(c['trk_eta'].content,eta.content))
+
+    def test_iterate(self):
+        c = self.write()
+        chunks = list(c.iterate(5,['trk_eta']))
+        self.assertEqual(map(lambda ch: len(ch['trk_eta']),chunks),[5,5,2])
+        eta = jaggedarray.concatenate(map(lambda ch: ch['trk_eta'],chunks))
+        self.assertTrue(np.array_equal(eta.content,c['trk_eta'].content))
+
+    def test_read_columns_range(self):
+        c = self.write()
+        cols = c.read_columns('mass',3,100)
+        self.assertEqual(len(cols['mass']),9)
+
+    def test_different_columns(self):
+        w = columncachewriter(self.path)
+        w.append(self.chunks[0])
+        self.assertRaises(KeyError,w.append,{'mass': self.chunks[1]['mass']})
+        w.close()
+
+    def test_not_a_cache(self):
+        self.assertRaises(IOError,columncache,self.path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""Tests of `PyAnUtils.jaggedarray` (ROOT not needed)
+"""
+import unittest
+
+import numpy as np
+
+from PyAnUtils.jaggedarray import jaggedarray
+
+class jaggedarraytest(unittest.TestCase):
+    def setUp(self):
+        # events: [211,11] [] [211,13,-211] []
+        self.a = jaggedarray.fromcounts(np.array([211,11,211,13,-211]),np.array([2,0,3,0]))
+
+    def assertEvents(self,a,events):
+        self.assertEqual(len(a),len(events))
+        for k,values in enumerate(events):
+            self.assertEqual(a[k].tolist(),values)
+
+    def test_reductions_empty_events(self):
+        self.assertEqual(self.a.counts().tolist(),[2,0,3,0])
+        self.assertEqual(self.a.sum().tolist(),[222,0,13,0])
+        self.assertEqual(self.a.max().tolist(),[211,float('-inf'),211,float('-inf')])
+        self.assertEqual(self.a.min(empty=0).tolist(),[11,0,-211,0])
+
+    def test_reductions_all_empty(self):
+        a = jaggedarray.fromcounts(np.zeros(0),np.zeros(3,dtype=np.int64))
+        self.assertEqual(a.sum().tolist(),[0,0,0])
+        self.assertEqual(a.max(empty=-1).tolist(),[-1,-1,-1])
+
+    def test_slices(self):
+        self.assertEvents(self.a[1:3],[[],[211,13,-211]])
+        self.assertEvents(self.a[::2],[[211,11],[211,13,-211]])
+        self.assertEvents(self.a[-1:],[[]])
+
+    def test_empty_and_reversed_slices(self):
+        empty = self.a[3:1]
+        self.assertEqual(len(empty),0)
+        self.assertEqual(len(empty.content),0)
+        self.assertEqual(len(self.a[2:2]),0)
+        self.assertEvents(self.a[::-1],[[],[211,13,-211],[],[211,11]])
+
+    def test_jagged_mask(self):
+        selected = self.a[self.a == 211]
+        self.assertEvents(selected,[[211],[],[211],[]])
+        selected = self.a[(abs(self.a) > 100) & (self.a != 211)]
+        self.assertEvents(selected,[[],[],[-211],[]])
+        self.assertEqual(self.a.count(self.a == 211).tolist(),[1,0,1,0])
+
+    def test_event_mask(self):
+        self.assertEvents(self.a[self.a.counts() > 0],[[211,11],[211,13,-211]])
+        self.assertEvents(self.a[np.array([2,0])],[[211,13,-211],[211,11]])
+
+    def test_mask_different_structure(self):
+        other = jaggedarray.fromcounts(np.ones(5,dtype=bool),np.array([1,1,3,0]))
+        self.assertRaises(ValueError,self.a.__getitem__,other)
+
+    def test_per_event_broadcast(self):
+        weights = np.array([1.,2.,3.,4.])
+        self.assertEvents(self.a*weights,[[211.,11.],[],[633.,39.,-633.],[]])
+        self.assertEvents(self.a > np.array([100,0,0,0]),[[True,False],[],[True,True,False],[]])
+        self.assertEqual((self.a+1).content.tolist(),[212,12,212,14,-210])
+
+    def test_concatenate(self):
+        a = jaggedarray.concatenate([self.a[:2],self.a[2:]])
+        self.assertEqual(a.offsets.tolist(),self.a.offsets.tolist())
+        self.assertEqual(a.content.tolist(),self.a.content.tolist())
+
+if __name__ == '__main__':
+    unittest.main()
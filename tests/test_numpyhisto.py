@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""Tests of the NumPy storages of `PyAnUtils.numpyhisto` (ROOT not needed)
+"""
+import unittest
+
+import numpy as np
+
+from PyAnUtils.numpyhisto import numpyhisto
+
+AXES = [(20,-1.,1.,None),(20,-1.,1.,None)]
+
+class sparsestoragetest(unittest.TestCase):
+    def setUp(self):
+        r = np.random.RandomState(7)
+        self.x,self.y = r.uniform(-1.2,1.2,(2,500))
+        self.w = r.uniform(0.,2.,500)
+
+    def assertSameBins(self,h1,h2):
+        sumw1,sumw21 = h1.getarrays()
+        sumw2,sumw22 = h2.getarrays()
+        self.assertTrue(np.allclose(sumw1,sumw2))
+        self.assertEqual(sumw21 is None,sumw22 is None)
+        if sumw21 is not None:
+            self.assertTrue(np.allclose(sumw21,sumw22))
+
+    def test_weighted_fill_after_buffered_fill(self):
+        h = numpyhisto('s','',AXES,storage='sparse')
+        d = numpyhisto('d','',AXES)
+        for hist in (h,d):
+            gbin = hist.Fill(.1,.2)
+            hist.Fill(.3,.3,2.0)
+        self.assertSameBins(h,d)
+        self.assertAlmostEqual(h.GetBinError(gbin),1.0)
+
+    def test_weighted_fill_array_after_buffered_fill(self):
+        h = numpyhisto('s','',AXES,storage='sparse')
+        d = numpyhisto('d','',AXES)
+        for hist in (h,d):
+            hist.Fill(.1,.2)
+            hist.fill_array(self.x,self.y,weights=self.w)
+        self.assertSameBins(h,d)
+        self.assertAlmostEqual(h.Integral(),d.Integral())
+
+    def test_scale_after_buffered_fill(self):
+        h = numpyhisto('s','',AXES,storage='sparse')
+        gbin = h.Fill(.1,.2)
+        h.Scale(2.)
+        self.assertEqual(h.GetBinContent(gbin),2.)
+        self.assertAlmostEqual(h.GetBinError(gbin),2.)
+
+    def test_weighted_fill_after_reset(self):
+        h = numpyhisto('s','',AXES,storage='sparse')
+        h.fill_array(self.x,self.y,weights=self.w)
+        h.Reset()
+        self.assertEqual(h.Integral(),0.)
+        h.fill_array(self.x,self.y,weights=self.w)
+        d = numpyhisto('d','',AXES)
+        d.fill_array(self.x,self.y,weights=self.w)
+        self.assertSameBins(h,d)
+
+    def test_add_dense_keeps_sparsity(self):
+        d = numpyhisto('d','',AXES)
+        d.Fill(.1,.2)
+        d.Fill(.5,.5)
+        h = numpyhisto('s','',AXES,storage='sparse')
+        h.Add(d)
+        self.assertEqual(len(h._keys),2)
+        self.assertSameBins(h,d)
+
+if __name__ == '__main__':
+    unittest.main()